@@ -0,0 +1,52 @@
+"""Compare full copies of a sweep's branch configurations against copy-on-write overlays."""
+from vivarium.config_tree import ConfigTree
+
+
+def _base_config():
+    data = {'component_{}'.format(i): {'parameter_{}'.format(j): float(j) for j in range(10)}
+            for i in range(50)}
+    base = ConfigTree(layers=['base', 'component_configs', 'model_override', 'override'])
+    base.read_dict(data, layer='base', source='benchmark')
+    base.freeze()
+    return base, data
+
+
+def _override(i):
+    return {'component_0': {'parameter_0': float(i)}, 'component_1': {'parameter_1': float(i)}}
+
+
+class BranchConfigs:
+    params = [100, 1000]
+    param_names = ['branches']
+
+    def setup(self, branches):
+        self.base, self.data = _base_config()
+
+    def _copies(self, branches):
+        trees = []
+        for i in range(branches):
+            tree = ConfigTree(layers=['base', 'component_configs', 'model_override', 'override'])
+            tree.read_dict(self.data, layer='base', source='benchmark')
+            tree.read_dict(_override(i), layer='override', source='branch')
+            trees.append(tree)
+        return trees
+
+    def _overlays(self, branches):
+        trees = []
+        for i in range(branches):
+            tree = self.base.overlay()
+            tree.read_dict(_override(i), layer='override', source='branch')
+            trees.append(tree)
+        return trees
+
+    def time_full_copies(self, branches):
+        self._copies(branches)
+
+    def time_overlays(self, branches):
+        self._overlays(branches)
+
+    def peakmem_full_copies(self, branches):
+        self._copies(branches)
+
+    def peakmem_overlays(self, branches):
+        self._overlays(branches)
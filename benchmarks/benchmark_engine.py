@@ -0,0 +1,38 @@
+"""Whole time steps of the reference model."""
+from vivarium.framework.engine import _step
+from vivarium.reference_model import ReferenceModel, measure_throughput
+from vivarium.test_util import setup_simulation
+
+from .common import configure, POPULATION_SIZES
+
+
+class Step:
+    params = POPULATION_SIZES
+    param_names = ['population_size']
+    timeout = 600
+
+    def setup(self, population_size):
+        configure()
+        self.simulation = setup_simulation([ReferenceModel(causes=3)], population_size=population_size)
+
+    def time_step(self, population_size):
+        _step(self.simulation)
+
+    def peakmem_step(self, population_size):
+        _step(self.simulation)
+
+
+class Throughput:
+    params = ([10000, 100000], [1, 5])
+    param_names = ['population_size', 'causes']
+    timeout = 600
+    # Each measurement runs a whole simulation, so once is enough.
+    number = 1
+    repeat = 1
+
+    def setup(self, population_size, causes):
+        configure()
+
+    def track_simulant_steps_per_second(self, population_size, causes):
+        return measure_throughput(population_size, causes, steps=6)['simulant_steps_per_second']
+    track_simulant_steps_per_second.unit = 'simulant steps/s'
@@ -0,0 +1,33 @@
+"""Evaluating interpolated lookup tables for a population."""
+import numpy as np
+import pandas as pd
+
+from vivarium.interpolation import Interpolation
+from vivarium.test_util import build_table
+
+from .common import configure, POPULATION_SIZES
+
+
+class Interpolate:
+    params = POPULATION_SIZES
+    param_names = ['population_size']
+    timeout = 300
+
+    def setup(self, population_size):
+        configure()
+        data = build_table(lambda age, sex, year: (age + 1)*(year - 1980)*np.where(sex == 'Male', 1, 1.1))
+        self.one_d = Interpolation(data[data.year == 1990].drop('year', axis=1), ('sex',), ('age',))
+        self.two_d = Interpolation(data, ('sex',), ('age', 'year'))
+
+        random = np.random.RandomState(12345)
+        self.population = pd.DataFrame({
+            'age': random.random_sample(population_size)*100,
+            'year': random.random_sample(population_size)*20 + 1990,
+            'sex': random.choice(['Male', 'Female'], population_size),
+        })
+
+    def time_1d(self, population_size):
+        self.one_d(self.population)
+
+    def time_2d(self, population_size):
+        self.two_d(self.population)
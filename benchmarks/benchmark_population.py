@@ -0,0 +1,38 @@
+"""Reading and writing the population table through a PopulationView."""
+import numpy as np
+import pandas as pd
+
+from vivarium.test_util import setup_simulation, generate_test_population
+
+from .common import configure, mark_dead, POPULATION_SIZES
+
+
+class PopulationView:
+    params = POPULATION_SIZES
+    param_names = ['population_size']
+    timeout = 300
+
+    def setup(self, population_size):
+        configure()
+        self.simulation = setup_simulation([generate_test_population], population_size=population_size)
+        manager = self.simulation.population
+        self.index = manager.population.index
+        # Kill a tenth of the population so that queries have something to filter
+        mark_dead(manager.get_view(['alive']), self.index[::10], manager.population.alive)
+
+        self.view = manager.get_view(['age', 'sex'])
+        self.living_view = manager.get_view(['age', 'sex'], query="alive == 'alive'")
+        self.age = pd.Series(np.random.random(len(self.index))*100, index=self.index, name='age')
+        self.living = self.living_view.get(self.index)
+
+    def time_get(self, population_size):
+        self.view.get(self.index)
+
+    def time_get_with_query(self, population_size):
+        self.living_view.get(self.index)
+
+    def time_update_series(self, population_size):
+        self.view.update(self.age)
+
+    def time_update_frame(self, population_size):
+        self.living_view.update(self.living)
@@ -0,0 +1,31 @@
+"""Common random number draws and choices."""
+import numpy as np
+import pandas as pd
+
+from vivarium.framework.randomness import RandomnessStream
+
+from .common import POPULATION_SIZES
+
+
+class Choice:
+    params = POPULATION_SIZES
+    param_names = ['population_size']
+
+    def setup(self, population_size):
+        self.stream = RandomnessStream('benchmark', lambda: pd.Timestamp(1990, 7, 2), seed=12345)
+        self.index = pd.Index(np.arange(population_size))
+        self.choices = ['a', 'b', 'c', 'd', 'e']
+        self.weights = [0.1, 0.2, 0.3, 0.2, 0.2]
+        self.row_weights = np.random.random((population_size, len(self.choices)))
+
+    def time_get_draw(self, population_size):
+        self.stream.get_draw(self.index)
+
+    def time_choice_1d_weights(self, population_size):
+        self.stream.choice(self.index, self.choices, self.weights)
+
+    def time_choice_2d_weights(self, population_size):
+        self.stream.choice(self.index, self.choices, self.row_weights)
+
+    def time_filter_for_rate(self, population_size):
+        self.stream.filter_for_rate(self.index, np.full(population_size, 0.1))
@@ -0,0 +1,48 @@
+"""Advancing a population through a state machine."""
+import numpy as np
+
+from vivarium.framework.event import listens_for
+from vivarium.framework.population import uses_columns
+from vivarium.framework.randomness import choice
+from vivarium.framework.state_machine import Machine, State
+from vivarium.test_util import setup_simulation
+
+from .common import configure, POPULATION_SIZES
+
+
+def sir_machine(column='sir'):
+    """A susceptible, infected, recovered machine whose recovered simulants slowly lose their immunity."""
+    susceptible, infected, recovered = [State(state_id, key=column)
+                                        for state_id in ['susceptible', 'infected', 'recovered']]
+    for state, output, probability in [(susceptible, infected, 0.05),
+                                       (infected, recovered, 0.2),
+                                       (recovered, susceptible, 0.01)]:
+        state.add_transition(output, lambda index, p=probability: np.full(len(index), p))
+        state.allow_self_transitions()
+    return Machine(column, states=[susceptible, infected, recovered])
+
+
+def _initial_states(column, states):
+    @listens_for('initialize_simulants')
+    @uses_columns([column])
+    def initialize(event):
+        event.population_view.update(choice(column + '_initial_state', event.index, states).rename(column))
+    return initialize
+
+
+class MachineStep:
+    params = POPULATION_SIZES
+    param_names = ['population_size']
+    timeout = 300
+
+    def setup(self, population_size):
+        configure()
+        self.machine = sir_machine()
+        self.simulation = setup_simulation(
+            [self.machine, _initial_states('sir', ['susceptible', 'infected', 'recovered'])],
+            population_size=population_size)
+        self.index = self.simulation.population.population.index
+        self.event_time = self.simulation.current_time + self.simulation.step_size
+
+    def time_transition(self, population_size):
+        self.machine.transition(self.index, self.event_time)
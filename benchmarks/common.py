@@ -0,0 +1,21 @@
+"""Shared set up for the framework benchmarks."""
+import pandas as pd
+
+from vivarium import config
+
+POPULATION_SIZES = [10000, 100000, 1000000]
+
+
+def configure():
+    """Give the simulation parameters the values the test suite uses so benchmarks don't depend on user config."""
+    config.reset_layer('override', preserve_keys=['input_data.intermediary_data_cache_path',
+                                                  'input_data.auxiliary_data_folder'])
+    config.read_dict({'simulation_parameters': {'year_start': 1990, 'year_end': 2010, 'time_step': 30.5,
+                                                'initial_age': ''}},
+                     layer='override', source='benchmarks')
+
+
+def mark_dead(population_view, index, alive):
+    """Set ``alive`` to 'dead' for the simulants in ``index``, where ``alive`` is the current column."""
+    dead = pd.Categorical(['dead']*len(index), categories=alive.cat.categories)
+    population_view.update(pd.Series(dead, index=index, name='alive'))
@@ -1,5 +1,9 @@
 import os
+
+import pytest
+
 from vivarium import config
+from vivarium.framework.engine import configure
 
 # Remove user overrides but keep custom cache locations if any
 config.reset_layer('override', preserve_keys=['input_data.intermediary_data_cache_path', 'input_data.auxiliary_data_folder'])
@@ -7,3 +11,16 @@ config.simulation_parameters.set_with_metadata('year_start', 1990, layer='overri
 config.simulation_parameters.set_with_metadata('year_end', 2010, layer='override', source=os.path.realpath(__file__))
 config.simulation_parameters.set_with_metadata('time_step', 30.5, layer='override', source=os.path.realpath(__file__))
 config.simulation_parameters.set_with_metadata('initial_age', '', layer='override', source=os.path.realpath(__file__))
+
+
+@pytest.fixture
+def short_simulation():
+    """Configure two year simulations and put the global configuration back afterwards.
+
+    Running a simulation in this process leaves the component configuration behind in the global config.
+    """
+    state = config.snapshot()
+    config.simulation_parameters.set_with_metadata('year_end', 1992, layer='override', source=os.path.realpath(__file__))
+    configure()
+    yield
+    config.restore(state)
@@ -0,0 +1,68 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from vivarium.framework.checkpoint import save_checkpoint, load_checkpoint, CheckpointError
+from vivarium.framework.components import load_component_manager
+from vivarium.framework.engine import configure, run, setup_simulation
+from vivarium.framework.event import listens_for
+from vivarium.framework.population import uses_columns
+from vivarium.framework.values import modifies_value
+
+
+class DeathCounter:
+    """Keeps its count outside the population table so it must be checkpointed."""
+    def setup(self, builder):
+        self.randomness = builder.randomness('death_counter')
+        self.deaths = 0
+
+    def get_state(self):
+        return self.deaths
+
+    def set_state(self, state):
+        self.deaths = state
+
+    @listens_for('time_step')
+    @uses_columns(['alive'], 'alive')
+    def mortality(self, event):
+        dead = self.randomness.filter_for_probability(event.index, np.full(len(event.index), 0.02))
+        self.deaths += len(dead)
+
+    @modifies_value('metrics')
+    def metrics(self, index, metrics):
+        metrics['counted_deaths'] = self.deaths
+        return metrics
+
+
+COMPONENT_CONFIG = {
+    'components': ['tests.framework.test_engine.Mortality()', 'tests.framework.test_checkpoint.DeathCounter()'],
+    'configuration': {
+        'simulation_parameters': {'population_size': 100, 'pop_age_start': None},
+    },
+}
+
+
+def test_resume(tmpdir, short_simulation):
+    path = str(tmpdir.join('checkpoint'))
+    uninterrupted = run(load_component_manager(COMPONENT_CONFIG))
+    # The final checkpoint is from before the last few steps so resuming from it has to redo them
+    checkpointed = run(load_component_manager(COMPONENT_CONFIG), checkpoint_path=path, checkpoint_interval=5)
+    simulation = setup_simulation(load_component_manager(COMPONENT_CONFIG))
+    load_checkpoint(simulation, path)
+    assert simulation.current_time == pd.Timestamp(1990, 7, 2) + 20*pd.Timedelta(30.5, unit='D')
+    assert len(simulation.population.population) == 100
+    resumed = run(load_component_manager(COMPONENT_CONFIG), checkpoint_path=path, resume=True)
+
+    for metric in ['deaths', 'dead_ids', 'counted_deaths']:
+        assert uninterrupted[metric] == checkpointed[metric] == resumed[metric]
+
+
+def test_checkpoint_mismatch(tmpdir, short_simulation):
+    path = str(tmpdir.join('checkpoint'))
+    simulation = setup_simulation(load_component_manager(COMPONENT_CONFIG))
+    simulation.current_time = pd.Timestamp('1990-01-01')
+    save_checkpoint(simulation, path)
+
+    configure(input_draw_number=1)
+    with pytest.raises(CheckpointError):
+        load_checkpoint(setup_simulation(load_component_manager(COMPONENT_CONFIG)), path)
@@ -6,10 +6,13 @@ from unittest.mock import patch, mock_open
 import pytest
 import yaml
 
+from vivarium import config
 from vivarium.framework.components import (_import_by_path, load_component_manager, ComponentManager,
                                            DummyDatasetManager, ComponentConfigError, _extract_component_list,
                                            _component_ast_to_path, _parse_component, ParsingError, _prep_components,
-                                           _extract_component_call, _is_literal)
+                                           _extract_component_call, _is_literal, _component_spec,
+                                           _component_specs, _component_spec_cache_path, _load_component_specs,
+                                           _save_component_specs)
 
 
 TEST_COMPONENTS = """
@@ -222,6 +225,21 @@ def test_ComponentManager__setup_components():
     assert mock_b_child3.builder_used_for_setup is builder
 
 
+def test_ComponentManager__setup_components_records_graph_and_times():
+    manager = ComponentManager({}, MockDatasetManager())
+    parent = MockComponentB('half', 'a', 'bee')
+    other = MockComponentA('Eric')
+    manager.components = [other, parent, [mock_component_c]]
+
+    manager.setup_components(object())
+
+    children = [c for p, c in manager.component_graph if p is parent]
+    assert [c.args for c in children] == [('half',), ('a',), ('bee',)]
+    assert (None, mock_component_c) in manager.component_graph
+    assert [c for c, _ in manager.setup_times] == [parent] + children
+    assert all(duration >= 0 for _, duration in manager.setup_times)
+
+
 def test_extract_component_call():
     description = 'cave_system.monsters.Rabbit("timid", 0.01)'
     component, args = _extract_component_call(ast.parse(description))
@@ -242,3 +260,47 @@ def test_is_literal():
     _, args = _extract_component_call(ast.parse('Test(ComplexCall("thing"))'))
 
     assert not _is_literal(args[0])
+
+
+def test_parse_component_cached():
+    desc = 'cave_system.monsters.Rabbit(["timid"], Dentition("102"))'
+    constructors = {'Dentition': lambda tooth_count: '{} teeth'.format(tooth_count)}
+
+    _, args = _parse_component(desc, constructors)
+    args[0].append('ravenous')
+    assert _component_spec(desc) == ('cave_system.monsters.Rabbit',
+                                     (('literal', ['timid']), ('constructor', 'Dentition', '102')))
+
+    _, args = _parse_component(desc, constructors)
+    assert args == [['timid'], '102 teeth']
+
+
+def test_component_spec_disk_cache(tmpdir):
+    component_list = ['cave_system.monsters.Rabbit("timid", 0.01)', 'cave_system.monsters.Knight()']
+    cache_path = _component_spec_cache_path(str(tmpdir), component_list)
+    for description in component_list:
+        _component_spec(description)
+    _save_component_specs(cache_path, component_list)
+
+    expected = {description: _component_specs.pop(description) for description in component_list}
+    _load_component_specs(cache_path)
+    assert {description: _component_specs[description] for description in component_list} == expected
+
+
+@patch('vivarium.framework.components._import_by_path', mock_importer)
+def test_ComponentManager__load_components_from_config_cache(tmpdir):
+    component_list = ['test_components.MockComponentA("Red Leicester", 2)', 'test_components.MockComponentB()']
+    state = config.snapshot()
+    try:
+        config.vivarium.set_with_metadata('component_cache_directory', str(tmpdir), layer='override', source=__file__)
+        ComponentManager(component_list, MockDatasetManager()).load_components_from_config()
+
+        expected = {description: _component_specs.pop(description) for description in component_list}
+        manager = ComponentManager(component_list, MockDatasetManager())
+        with patch('vivarium.framework.components._extract_component_call') as parse:
+            manager.load_components_from_config()
+        assert not parse.called
+        assert {description: _component_specs[description] for description in component_list} == expected
+        assert manager.components[0].args == ('Red Leicester', 2)
+    finally:
+        config.restore(state)
@@ -0,0 +1,182 @@
+from copy import deepcopy
+
+import numpy as np
+import pandas as pd
+
+import pytest
+
+from vivarium import config, VivariumError
+from vivarium.framework.components import load_component_manager
+from vivarium.framework.engine import (run_batch, run, configure, merge_metrics, setup_simulation,
+                                       run_prepared, run_from_fork)
+from vivarium.framework.util import run_in_fork
+from vivarium.test_util import setup_simulation as setup_test_simulation
+from vivarium.framework.event import listens_for
+from vivarium.framework.population import uses_columns
+from vivarium.framework.values import modifies_value
+
+
+class Counter:
+    def setup(self, builder):
+        self.increment = config.counter.increment
+
+    @listens_for('initialize_simulants')
+    @uses_columns(['count'])
+    def load_population_columns(self, event):
+        event.population_view.update(pd.Series(0, index=event.index, name='count'))
+
+    @listens_for('time_step')
+    @uses_columns(['count'])
+    def count(self, event):
+        event.population_view.update(event.population['count'] + self.increment)
+
+    @modifies_value('metrics')
+    @uses_columns(['count'])
+    def metrics(self, index, metrics, population_view):
+        metrics['total_count'] = population_view.get(index)['count'].sum()
+        return metrics
+
+
+class LiveCounter(Counter):
+    """Reads its increment every step rather than during setup."""
+    def setup(self, builder):
+        pass
+
+    @listens_for('time_step')
+    @uses_columns(['count'])
+    def count(self, event):
+        event.population_view.update(event.population['count'] + config.live_counter.increment)
+
+
+class Mortality:
+    def setup(self, builder):
+        self.randomness = builder.randomness('mortality')
+
+    @listens_for('initialize_simulants')
+    @uses_columns(['alive'])
+    def load_population_columns(self, event):
+        event.population_view.update(pd.Series(True, index=event.index, name='alive'))
+
+    @listens_for('time_step')
+    @uses_columns(['alive'], 'alive')
+    def mortality(self, event):
+        dead = self.randomness.filter_for_probability(event.index, np.full(len(event.index), 0.05))
+        event.population_view.update(pd.Series(False, index=dead, name='alive'))
+
+    @modifies_value('metrics')
+    @uses_columns(['alive'])
+    def metrics(self, index, metrics, population_view):
+        alive = population_view.get(index)['alive']
+        metrics['deaths'] = int((~alive).sum())
+        metrics['dead_ids'] = sum(alive.index[~alive])
+        return metrics
+
+
+COMPONENT_CONFIG = {
+    'components': ['tests.framework.test_engine.Counter()'],
+    'configuration': {
+        'simulation_parameters': {'population_size': 10, 'pop_age_start': None},
+        'counter': {'increment': 1},
+    },
+}
+
+
+class Configured:
+    """Becomes the source of its configuration defaults, which can't be pickled because of its clock."""
+    configuration_defaults = {'configured': {'value': 1}}
+
+    def setup(self, builder):
+        self.clock = builder.clock()
+
+
+def test_run_batch(tmpdir):
+    results_path = str(tmpdir.join('output.hdf'))
+    branches = [{'counter': {'increment': [1, 2]}, 'simulation_parameters': {'year_end': 1991}}]
+
+    state = config.snapshot()
+    try:
+        # A simulation set up earlier in the same process mustn't stop the batch from capturing the configuration
+        setup_test_simulation([Configured()])
+        results = run_batch(COMPONENT_CONFIG, branches, range(2), workers=2, results_path=results_path)
+    finally:
+        config.restore(state)
+
+    assert len(results) == 4
+    assert list(results['input_draw']) == [0, 1, 0, 1]
+    assert list(results['counter.increment']) == [1, 1, 2, 2]
+    steps = results['total_count'][0] / 10
+    assert steps > 0
+    assert list(results['total_count']) == [10*steps, 10*steps, 20*steps, 20*steps]
+
+    written = pd.read_hdf(results_path, 'data')
+    assert list(written['total_count']) == list(results['total_count'])
+    assert pd.read_hdf(results_path, 'runs/branch_1_draw_0')['total_count'][0] == 20*steps
+
+
+MORTALITY_CONFIG = {
+    'components': ['tests.framework.test_engine.Counter()', 'tests.framework.test_engine.Mortality()'],
+    'configuration': {
+        'simulation_parameters': {'population_size': 100, 'pop_age_start': None},
+        'counter': {'increment': 1},
+    },
+}
+
+
+def test_run_sharded(short_simulation):
+    component_config = MORTALITY_CONFIG
+    configure()
+
+    unsharded = run(load_component_manager(component_config))
+    sharded = run(load_component_manager(component_config), shards=3)
+
+    assert 0 < unsharded['deaths'] < 100
+    for metric in ['total_count', 'deaths', 'dead_ids']:
+        assert sharded[metric] == unsharded[metric]
+
+
+def test_merge_metrics():
+    merged = merge_metrics([{'deaths': 2, 'simulation_run_time': 3.0, 'label': 'a'},
+                            {'deaths': 5, 'simulation_run_time': 1.0, 'label': 'b'}])
+    assert merged == {'deaths': 7, 'simulation_run_time': 3.0, 'label': 'a'}
+
+
+def test_run_prepared(short_simulation):
+    configure(input_draw_number=0, model_draw_number=0)
+    simulation = setup_simulation(load_component_manager(MORTALITY_CONFIG))
+    first, second, first_again = [run_in_fork(run_prepared, simulation, model_draw) for model_draw in [1, 2, 1]]
+    assert simulation.population.population.empty
+
+    configure(model_draw_number=2)
+    fresh = run(load_component_manager(MORTALITY_CONFIG))
+
+    for metric in ['total_count', 'deaths', 'dead_ids']:
+        assert first[metric] == first_again[metric]
+        assert second[metric] == fresh[metric]
+    assert first['dead_ids'] != second['dead_ids']
+
+
+def test_run_from_fork(tmpdir, short_simulation):
+    configure()
+    branches = [{'counter': {'increment': [1, 2]}}]
+    fork_time = pd.Timestamp(1990, 7, 2) + 10*pd.Timedelta(30.5, unit='D')
+    unforked = run(load_component_manager(MORTALITY_CONFIG))
+    assert unforked['total_count'] == 100*24
+
+    # Counter reads its configuration during setup so continuing the same simulation can't see overrides
+    with pytest.raises(VivariumError):
+        run_from_fork(MORTALITY_CONFIG, branches, fork_time, workers=2)
+
+    # but setting up a fresh simulation for each branch from a checkpoint does.
+    forked = run_from_fork(MORTALITY_CONFIG, branches, fork_time, checkpoint_path=str(tmpdir.join('fork')),
+                           workers=2)
+    assert [metrics['total_count'] for metrics in forked] == [100*24, 100*(10 + 14*2)]
+
+    for metrics in forked:
+        assert metrics['dead_ids'] == unforked['dead_ids']
+
+    # Configuration read as the simulation runs can be overridden in the same simulation.
+    live_config = deepcopy(MORTALITY_CONFIG)
+    live_config['components'] = ['tests.framework.test_engine.LiveCounter()', 'tests.framework.test_engine.Mortality()']
+    live_config['configuration']['live_counter'] = {'increment': 1}
+    forked = run_from_fork(live_config, [{'live_counter': {'increment': [1, 2]}}], fork_time, workers=2)
+    assert [metrics['total_count'] for metrics in forked] == [100*24, 100*(10 + 14*2)]
@@ -4,6 +4,8 @@ import numpy as np
 import pandas as pd
 
 from vivarium import config
+from vivarium.framework.lookup import publish_table, attach_table
+from vivarium.interpolation import Interpolation
 from vivarium.test_util import build_table, setup_simulation, generate_test_population
 
 
@@ -93,3 +95,31 @@ def test_interpolated_tables__exact_values_at_input_points():
         simulation.current_time = pd.Timestamp(year, 1, 1)
         assert np.allclose(years(simulation.population.population.index),
                            simulation.current_time.year + 1/365, rtol=1.e-5)
+
+
+def test_shared_tables(tmpdir):
+    data = build_table([None, None], columns=('age', 'year', 'sex', 'rate', 'other_rate'))
+    one_d = data[data.year == data.year.min()].drop('year', axis=1)
+    path = str(tmpdir.join('two_d'))
+    assert publish_table(data, path) == path
+    assert publish_table(data.assign(rate=0), path) == path  # Already published so this is a no-op
+    publish_table(one_d, str(tmpdir.join('one_d')), parameter_columns=('age',))
+
+    points = pd.DataFrame({'age': np.random.uniform(-10, 150, 1000),
+                           'year': np.random.uniform(1980, 2020, 1000),
+                           'sex': np.random.choice(['Male', 'Female'], 1000)})
+
+    shared = attach_table(path)
+    assert shared.interpolations['Male'][1].base is not None  # Memory mapped rather than loaded
+    expected = Interpolation(data, ('sex',), ('age', 'year'))(points)
+    assert np.allclose(shared(points), expected)
+
+    shared = attach_table(str(tmpdir.join('one_d')))
+    expected = Interpolation(one_d, ('sex',), ('age',))(points)
+    assert np.allclose(shared(points), expected)
+
+    simulation = setup_simulation([generate_test_population], 1000)
+    index = simulation.population.population.index
+    shared = simulation.tables.build_table(attach_table(path))(index)
+    expected = simulation.tables.build_table(data)(index)
+    assert np.allclose(shared[['rate', 'other_rate']], expected[['rate', 'other_rate']])
@@ -0,0 +1,138 @@
+import os
+from copy import deepcopy
+
+import pandas as pd
+import pytest
+
+from vivarium.framework.components import load_component_manager
+from vivarium.framework.engine import run, run_batch
+from vivarium.framework.event import listens_for
+from vivarium.framework.metrics import MetricsSink, MetricsError
+from vivarium.framework.population import uses_columns
+from vivarium.framework.results import branch_key
+
+
+class LivingCounter:
+    def setup(self, builder):
+        self.metrics = builder.metrics_sink()
+
+    @listens_for('collect_metrics')
+    @uses_columns(['alive'])
+    def count(self, event):
+        self.metrics.record('living', {'living': int(event.population.alive.sum()), 'cause': 'all'})
+
+
+COMPONENT_CONFIG = {
+    'components': ['tests.framework.test_engine.Mortality()', 'tests.framework.test_metrics.LivingCounter()'],
+    'configuration': {
+        'simulation_parameters': {'population_size': 100, 'pop_age_start': None},
+    },
+}
+
+
+def test_sink_buffers_until_full(tmpdir):
+    path = str(tmpdir.join('metrics.hdf'))
+    sink = MetricsSink(path, buffer_size=5)
+
+    for i in range(4):
+        sink.record('counts', {'step': i, 'label': 'a'*i})
+    sink.end_step()
+    assert not os.path.exists(path)
+
+    sink.record('counts', pd.DataFrame({'step': [4, 5], 'label': ['x', 'y']}, index=[10, 11]))
+    sink.end_step()
+    assert len(pd.read_hdf(path, 'counts')) == 6
+
+    sink.record('counts', {'step': 6, 'label': 'a much longer label than any written before'})
+    result = sink.read('counts')
+    assert list(result.step) == list(range(7))
+    assert result.label.iloc[-1] == 'a much longer label than any written before'
+
+    sink.flush()
+    assert list(pd.read_hdf(path, 'counts').step) == list(range(7))
+
+
+def test_sink_in_memory():
+    sink = MetricsSink(buffer_size=1, clock=lambda: pd.Timestamp('1990-01-01'))
+    sink.record('counts', {'count': 1})
+    sink.end_step()
+    sink.record('counts', {'count': 2})
+
+    result = sink.read('counts')
+    assert list(result.columns) == ['time', 'count']
+    assert list(result['count']) == [1, 2]
+    assert sink.tables == ['counts']
+    with pytest.raises(KeyError):
+        sink.read('missing')
+
+
+def test_sink_string_size(tmpdir):
+    path = str(tmpdir.join('metrics.hdf'))
+    sink = MetricsSink(path, string_size=10)
+    sink.record('labels', {'label': 'a'})
+    sink.flush()
+
+    # Written after a shorter batch, but still fits the width reserved for the column
+    sink.record('labels', {'label': 'b'*10})
+    sink.flush()
+    assert list(pd.read_hdf(path, 'labels').label) == ['a', 'b'*10]
+
+    with pytest.raises(MetricsError):
+        sink.record('labels', {'label': 'c'*11})
+
+
+def test_sink_memory_limit():
+    sink = MetricsSink(buffer_size=2, max_memory_rows=3)
+    for i in range(3):
+        sink.record('counts', {'count': i})
+        sink.end_step()
+    sink.record('counts', {'count': 3})
+    with pytest.raises(MetricsError):
+        sink.flush()
+
+
+def test_sink_schema():
+    sink = MetricsSink()
+    sink.record('counts', {'count': 1})
+    with pytest.raises(MetricsError):
+        sink.record('counts', {'count': 1.5})
+    with pytest.raises(MetricsError):
+        sink.record('counts', {'count': 1, 'other': 2})
+
+
+def test_streaming_metrics(tmpdir, short_simulation):
+    path = str(tmpdir.join('metrics.hdf'))
+    component_config = deepcopy(COMPONENT_CONFIG)
+    component_config['configuration']['metrics'] = {'path': path, 'buffer_size': 10}
+
+    metrics = run(load_component_manager(component_config))
+
+    living = pd.read_hdf(path, 'living')
+    assert len(living) == 24
+    assert list(living.columns) == ['time', 'input_draw', 'model_draw', 'branch', 'living', 'cause']
+    assert living.time.is_monotonic_increasing
+    assert living.living.is_monotonic_decreasing
+    assert living.living.iloc[-1] == 100 - metrics['deaths']
+    assert set(living.input_draw) == {0} and set(living.model_draw) == {0} and set(living.branch) == {'base'}
+
+    # Running again replaces the earlier run's observations rather than adding to them
+    run(load_component_manager(component_config))
+    assert len(pd.read_hdf(path, 'living')) == 24
+
+
+def test_batch_metrics(tmpdir, short_simulation):
+    path = str(tmpdir.join('metrics.hdf'))
+    component_config = deepcopy(COMPONENT_CONFIG)
+    component_config['configuration']['metrics'] = {'path': path}
+    branches = [{'simulation_parameters': {'population_size': size}} for size in [100, 50]]
+
+    run_batch(component_config, branches, range(2), workers=2)
+
+    assert not os.path.exists(path)
+    for branch in branches:
+        for input_draw in range(2):
+            living = pd.read_hdf('{}.branch_{}_draw_{}_0'.format(path, branch_key(branch), input_draw), 'living')
+            assert len(living) == 24
+            assert set(living.input_draw) == {input_draw}
+            assert set(living.branch) == {branch_key(branch)}
+            assert living.living.iloc[0] <= branch['simulation_parameters']['population_size']
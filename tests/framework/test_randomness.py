@@ -1,3 +1,6 @@
+import gc
+import weakref
+
 import pytest
 import pandas as pd
 import numpy as np
@@ -110,3 +113,15 @@ def test_choice_with_residuals(index, choices, weights_with_residuals):
 
         for k, c in count.items():
             assert np.isclose(c / len(index), weights[choices.index(k)], atol=0.01)
+
+
+def test_copies_follow_seed_and_can_be_collected():
+    randomness = RandomnessStream('test', lambda: pd.Timestamp(1990, 1, 1), 1)
+    kept = randomness.copy_with_additional_key('kept')
+    dropped = weakref.ref(randomness.copy_with_additional_key('dropped'))
+
+    gc.collect()
+    assert dropped() is None
+
+    randomness.set_seed(2)
+    assert kept.seed == 2
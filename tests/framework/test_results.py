@@ -0,0 +1,133 @@
+import os
+import pickle
+import zlib
+from unittest.mock import patch
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from vivarium.framework.results import (encode_results, decode_results, concat_results, ResultsFormatError,
+                                        append_results, read_dataset, compact_dataset, branch_key, partition_path)
+
+
+def _results(draw):
+    index = pd.MultiIndex.from_tuples([(draw, 0)], names=['input_draw_number', 'model_draw_number'])
+    return pd.DataFrame({'deaths': [np.int64(draw*10)],
+                         'years_lived': [draw*1.5],
+                         'converged': [bool(draw % 2)],
+                         'label': ['draw_{}'.format(draw)],
+                         'run_start': [pd.Timestamp(1990, 1, draw+1)]},
+                        index=index, columns=['deaths', 'years_lived', 'converged', 'label', 'run_start'])
+
+
+def test_round_trip():
+    results = _results(3)
+    encoded = encode_results(results)
+    assert isinstance(encoded, bytes)
+    pd.testing.assert_frame_equal(decode_results(encoded), results)
+
+    encoded = encode_results(results, text=True)
+    assert isinstance(encoded, str)
+    pd.testing.assert_frame_equal(decode_results(encoded), results)
+
+    with pytest.raises(ResultsFormatError):
+        decode_results(b'{"deaths": 3}')
+
+
+def test_decode_never_unpickles():
+    class Payload:
+        def __reduce__(self):
+            return (os.remove, ('never_removed',))
+
+    magic = encode_results(_results(0))[:8]
+    with pytest.raises(ResultsFormatError):
+        decode_results(magic + zlib.compress(pickle.dumps(Payload())))
+
+    with pytest.raises(ResultsFormatError):
+        encode_results(pd.DataFrame({'objects': [{'a': 1}]}))
+
+
+def test_concat_results():
+    results = [_results(draw) for draw in range(20)]
+    combined = concat_results(encode_results(r, text=True) for r in results)
+    pd.testing.assert_frame_equal(combined, pd.concat(results))
+
+    # Results with differing columns are still combined
+    results.append(_results(20).drop('label', axis=1).assign(extra=1.0))
+    combined = concat_results(encode_results(r) for r in results)
+    assert len(combined) == 21
+    assert combined['extra'].isnull().sum() == 20
+    assert concat_results([]).empty
+
+
+def test_results_dataset(tmpdir):
+    dataset = str(tmpdir.join('dataset'))
+    branches = [branch_key(None), branch_key({'intervention': {'coverage': 0.5}})]
+    assert branches[0] == 'base'
+    assert branches[1] == branch_key({'intervention': {'coverage': 0.5}})
+
+    expected = {branch: [] for branch in branches}
+    for draw in range(6):
+        for branch in branches:
+            results = _results(draw)
+            append_results(dataset, results, branch=branch, input_draw=draw % 2, worker='worker_{}'.format(draw % 3))
+            expected[branch].append(results)
+
+    partition = partition_path(dataset, branches[1], 0)
+    assert len(os.listdir(partition)) == 3
+
+    def sort(frame):
+        return frame.sort_index()
+
+    for branch in branches:
+        pd.testing.assert_frame_equal(sort(read_dataset(dataset, branch=branch)), sort(pd.concat(expected[branch])))
+    assert len(read_dataset(dataset, input_draw=1)) == 6
+    before = sort(read_dataset(dataset))
+
+    assert compact_dataset(dataset) == 12
+    assert os.listdir(partition) == ['compacted.hdf']
+    pd.testing.assert_frame_equal(sort(read_dataset(dataset)), before)
+
+    # Compacting again has nothing to do until more runs are appended
+    assert compact_dataset(dataset) == 0
+    append_results(dataset, _results(6), branch=branches[0], input_draw=0)
+    assert compact_dataset(dataset) == 2
+    assert len(read_dataset(dataset)) == 13
+
+    with pytest.raises(ResultsFormatError):
+        append_results(dataset, _results(7).assign(label='x'*300))
+
+
+def test_results_dataset_crash_while_appending(tmpdir):
+    dataset = str(tmpdir.join('dataset'))
+    append_results(dataset, _results(0), worker='w')
+    path = os.path.join(partition_path(dataset, 'base', 0), 'part-w.hdf')
+    size = os.path.getsize(path)
+    with open(path, 'r+b') as f:
+        f.truncate(size // 2)
+
+    assert read_dataset(dataset).empty
+    append_results(dataset, _results(1), worker='w')
+    pd.testing.assert_frame_equal(read_dataset(dataset), _results(1))
+    assert len(os.listdir(partition_path(dataset, 'base', 0))) == 2
+
+
+def test_results_dataset_crash_while_compacting(tmpdir):
+    dataset = str(tmpdir.join('dataset'))
+    for draw in range(3):
+        append_results(dataset, _results(draw), worker='w{}'.format(draw))
+    before = read_dataset(dataset).sort_index()
+
+    # Stop after the compacted file is written but before the merged files are removed
+    with patch('vivarium.framework.results.os.remove', side_effect=OSError):
+        with pytest.raises(OSError):
+            compact_dataset(dataset)
+    partition = partition_path(dataset, 'base', 0)
+    assert 'compacted.hdf' in os.listdir(partition) and len(os.listdir(partition)) == 4
+    pd.testing.assert_frame_equal(read_dataset(dataset).sort_index(), before)
+
+    append_results(dataset, _results(3), worker='w0')
+    compact_dataset(dataset)
+    assert os.listdir(partition) == ['compacted.hdf']
+    assert len(read_dataset(dataset)) == 4
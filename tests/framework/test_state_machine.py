@@ -1,3 +1,5 @@
+import pytest
+
 import pandas as pd
 import numpy as np
 
@@ -6,7 +8,8 @@ from vivarium.framework.population import uses_columns
 from vivarium.framework.event import listens_for
 from vivarium.framework.randomness import choice
 
-from vivarium.framework.state_machine import Machine, State, Transition
+from vivarium.framework.state_machine import (Machine, State, Transition, TransientState, MarkovMachine,
+                                             ScheduledState, _EventCalendar)
 
 def _population_fixture(column, initial_value):
     @listens_for('initialize_simulants')
@@ -107,3 +110,182 @@ def test_side_effects():
     assert np.all(simulation.population.population['count'] == 1)
     machine.transition(simulation.population.population.index, event_time)
     assert np.all(simulation.population.population['count'] == 2)
+
+
+def test_transient_chain():
+    done_state = State('done')
+    second_transient = TransientState('second_transient')
+    first_transient = TransientState('first_transient')
+    start_state = State('start')
+    start_state.add_transition(first_transient)
+    first_transient.add_transition(second_transient)
+    second_transient.add_transition(done_state)
+
+    machine = Machine('state', states=[start_state, first_transient, second_transient, done_state])
+
+    simulation = setup_simulation([machine, _population_fixture('state', 'start')])
+    event_time = simulation.current_time + simulation.step_size
+    machine.transition(simulation.population.population.index, event_time)
+    assert np.all(simulation.population.population.state == 'done')
+
+
+def test_transient_side_effect_sees_state():
+    class CheckedTransientState(TransientState):
+        seen = []
+
+        @uses_columns(['state'])
+        def _transition_side_effect(self, index, event_time, population_view):
+            self.seen.extend(population_view.get(index).state)
+
+    done_state = State('done')
+    transient = CheckedTransientState('transient')
+    start_state = State('start')
+    start_state.add_transition(transient)
+    transient.add_transition(done_state)
+
+    machine = Machine('state', states=[start_state, transient, done_state])
+
+    simulation = setup_simulation([machine, _population_fixture('state', 'start')])
+    event_time = simulation.current_time + simulation.step_size
+    machine.transition(simulation.population.population.index, event_time)
+    assert set(transient.seen) == {'transient'}
+    assert len(transient.seen) == len(simulation.population.population)
+    assert np.all(simulation.population.population.state == 'done')
+
+
+def test_transient_chain_writes_once_per_hop():
+    done_a, done_b = State('done_a'), State('done_b')
+    transient = TransientState('transient')
+    start_state = State('start')
+    start_state.add_transition(transient)
+    transient.add_transition(done_a, lambda index: pd.Series(0.5, index=index))
+    transient.add_transition(done_b, lambda index: pd.Series(0.5, index=index))
+
+    machine = Machine('state', states=[start_state, transient, done_a, done_b])
+
+    simulation = setup_simulation([machine, _population_fixture('state', 'start')])
+    event_time = simulation.current_time + simulation.step_size
+    updates = []
+    population_view = machine.population_view
+    original_update = population_view.update
+    population_view.update = lambda pop: updates.append(pop) or original_update(pop)
+    machine.transition(simulation.population.population.index, event_time)
+
+    assert len(updates) == 2
+    assert set(updates[-1]) == {'done_a', 'done_b'}
+    assert set(simulation.population.population.state) == {'done_a', 'done_b'}
+
+
+def test_transient_cycle():
+    a_transient = TransientState('a')
+    b_transient = TransientState('b')
+    start_state = State('start')
+    start_state.add_transition(a_transient)
+    a_transient.add_transition(b_transient)
+    b_transient.add_transition(a_transient)
+
+    machine = Machine('state', states=[start_state, a_transient, b_transient])
+
+    simulation = setup_simulation([machine, _population_fixture('state', 'start')])
+    event_time = simulation.current_time + simulation.step_size
+    with pytest.raises(ValueError):
+        machine.transition(simulation.population.population.index, event_time)
+
+
+def test_markov_machine():
+    rates = pd.DataFrame({'sex': ['Male', 'Female', 'Male', 'Female'],
+                          'from_state': ['healthy', 'healthy', 'sick', 'sick'],
+                          'to_state': ['sick', 'sick', 'healthy', 'healthy'],
+                          'rate': [1e6, 0.0, 0.0, 0.0]})
+    machine = MarkovMachine('state', ['healthy', 'sick'], rates, key_columns=['sex'])
+
+    simulation = setup_simulation([machine, _population_fixture('state', 'healthy'),
+                                   _even_population_fixture('sex', ['Male', 'Female'])], population_size=1000)
+    event_time = simulation.current_time + simulation.step_size
+    machine.transition(simulation.population.population.index, event_time)
+
+    population = simulation.population.population
+    assert np.all(population.loc[population.sex == 'Male', 'state'] == 'sick')
+    assert np.all(population.loc[population.sex == 'Female', 'state'] == 'healthy')
+
+
+def test_markov_machine_probabilities():
+    rates = pd.DataFrame({'from_state': ['a', 'a'], 'to_state': ['b', 'c'], 'rate': [1.0, 3.0]})
+    machine = MarkovMachine('state', ['a', 'b', 'c'], rates)
+
+    probabilities = machine.transition_probabilities(pd.Timedelta(days=365))[0]
+    exit_probability = 1 - np.exp(-4.0)
+    assert np.allclose(probabilities.sum(axis=1), 1)
+    assert np.allclose(probabilities[0], [1 - exit_probability, exit_probability/4, 3*exit_probability/4])
+    assert np.allclose(probabilities[1], [0, 1, 0])
+
+
+def test_markov_machine_bad_table():
+    with pytest.raises(ValueError):
+        MarkovMachine('state', ['a', 'b'], pd.DataFrame({'from_state': ['a'], 'to_state': ['z'], 'rate': [1.0]}))
+
+
+def test_event_time_scheduling():
+    done_state = State('done')
+    start_state = ScheduledState('start', lambda index: pd.Series(45, index=index))
+    start_state.add_transition(done_state)
+    machine = Machine('state', states=[start_state, done_state], event_time_scheduling=True)
+
+    simulation = setup_simulation([machine, _population_fixture('state', 'start')])
+    simulation.step_size = pd.Timedelta(days=30)
+
+    event_time = simulation.current_time + simulation.step_size
+    machine.transition(simulation.population.population.index, event_time)
+    assert np.all(simulation.population.population.state == 'start')
+
+    simulation.current_time = event_time
+    event_time = simulation.current_time + simulation.step_size
+    machine.transition(simulation.population.population.index, event_time)
+    assert np.all(simulation.population.population.state == 'done')
+
+
+def test_event_time_scheduling_drops_excluded_simulants():
+    done_state = State('done')
+    start_state = ScheduledState('start', lambda index: pd.Series(45, index=index))
+    start_state.add_transition(done_state)
+    machine = Machine('state', states=[start_state, done_state], event_time_scheduling=True)
+
+    simulation = setup_simulation([machine, _population_fixture('state', 'start')], population_size=100)
+    simulation.step_size = pd.Timedelta(days=30)
+    index = simulation.population.population.index
+    event_time = simulation.current_time + simulation.step_size
+    machine.transition(index, event_time)
+    assert np.all(machine._calendar.scheduled(index) == index)
+
+    # All are due but half are excluded, as though they had died
+    simulation.current_time = event_time
+    machine.transition(index[:50], event_time + simulation.step_size)
+    assert machine._calendar.scheduled(index).empty
+    assert not machine._calendar._heap
+    assert list(simulation.population.population.state) == ['done']*50 + ['start']*50
+
+
+def test_event_calendar_pop_due_once():
+    calendar = _EventCalendar()
+    calendar.schedule(pd.Index([1, 2]), pd.Series(pd.Timestamp('1990-01-01'), index=[1, 2]))
+    calendar.schedule(pd.Index([1]), pd.Series(pd.Timestamp('1990-01-05'), index=[1]))
+    assert list(calendar.pop_due(pd.Timestamp('1990-01-10'))) == [1, 2]
+    assert calendar.pop_due(pd.Timestamp('1990-01-10')).empty
+
+
+def test_event_time_scheduling_reschedules_on_null_transition():
+    done_state = State('done')
+    start_state = ScheduledState('start', lambda index: pd.Series(10, index=index))
+    start_state.add_transition(done_state, probability_func=lambda index: np.full(len(index), 0.5))
+    start_state.allow_self_transitions()
+    machine = Machine('state', states=[start_state, done_state], event_time_scheduling=True)
+
+    simulation = setup_simulation([machine, _population_fixture('state', 'start')], population_size=1000)
+    simulation.step_size = pd.Timedelta(days=30)
+    event_time = simulation.current_time + simulation.step_size
+    machine.transition(simulation.population.population.index, event_time)
+
+    remaining = simulation.population.population.state == 'start'
+    assert round(remaining.mean(), 1) == 0.5
+    assert np.all(machine._calendar.scheduled(simulation.population.population.index[remaining])
+                  == simulation.population.population.index[remaining])
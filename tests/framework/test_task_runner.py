@@ -0,0 +1,78 @@
+import json
+import os
+
+import pytest
+
+from vivarium import config
+from vivarium.framework.results import concat_results
+from vivarium.framework.task_runner import LocalTaskRunner, TaskRunnerError, job_key
+
+
+class Flaky:
+    """Fails the first ``failures`` times it is set up, counting set ups in a file."""
+    def setup(self, builder):
+        path = config.flaky.path
+        count = int(open(path).read()) if os.path.exists(path) else 0
+        with open(path, 'w') as f:
+            f.write(str(count + 1))
+        if count < config.flaky.failures:
+            raise ValueError('Flaky failure')
+
+
+@pytest.fixture
+def jobs(tmpdir, short_simulation):
+    config.simulation_parameters.set_with_metadata('year_end', 1991, layer='override', source=__file__)
+    component_config = {
+        'components': ['tests.framework.test_engine.Counter()', 'tests.framework.test_task_runner.Flaky()'],
+        'configuration': {
+            'simulation_parameters': {'population_size': 10, 'pop_age_start': None},
+            'counter': {'increment': 1},
+            'flaky': {'path': str(tmpdir.join('count')), 'failures': 1},
+        },
+    }
+    return [(0, model_draw, component_config, {'counter': {'increment': increment}}, str(tmpdir))
+            for increment in [1, 2] for model_draw in [0, 1]]
+
+
+def test_local_task_runner(tmpdir, jobs):
+    manifest = str(tmpdir.join('manifest.jsonl'))
+    results = LocalTaskRunner(workers=1, manifest_path=manifest).run(jobs)
+
+    results = concat_results(results)
+    assert list(results['counter.increment']) == [1, 1, 2, 2]
+    assert list(results.index.get_level_values('model_draw_number')) == [0, 1, 0, 1]
+    # Jobs which only differ in model draw share a set up so there is the failed set up, one for
+    # each branch and one more when the failed job is retried after the second branch.
+    assert tmpdir.join('count').read() == '4'
+
+    # Everything is in the manifest so nothing is run again
+    with open(manifest, 'a') as f:
+        f.write('{"key": "partly written')
+    resumed = LocalTaskRunner(workers=1, manifest_path=manifest).run(jobs)
+    assert concat_results(resumed).equals(results)
+    assert tmpdir.join('count').read() == '4'
+
+
+def test_local_task_runner_retries(tmpdir, jobs):
+    with pytest.raises(TaskRunnerError):
+        LocalTaskRunner(workers=1, max_retries=0).run(jobs[:1])
+    tmpdir.join('count').remove()
+    assert len(LocalTaskRunner(workers=1, max_retries=1).run(jobs[:1])) == 1
+
+
+def test_local_task_runner_resume_after_crash(tmpdir, jobs):
+    manifest = str(tmpdir.join('manifest.jsonl'))
+    LocalTaskRunner(workers=1, manifest_path=manifest).run(jobs[:2])
+    # A crash while recording the third job
+    with open(manifest, 'a') as f:
+        f.write('{"key": "partly written')
+
+    results = LocalTaskRunner(workers=1, manifest_path=manifest).run(jobs)
+    with open(manifest) as f:
+        records = [json.loads(line) for line in f]
+    assert sorted(record['key'] for record in records) == sorted(job_key(job) for job in jobs)
+
+    setups = tmpdir.join('count').read()
+    resumed = LocalTaskRunner(workers=1, manifest_path=manifest).run(jobs)
+    assert concat_results(resumed).equals(concat_results(results))
+    assert tmpdir.join('count').read() == setups
@@ -1,8 +1,13 @@
+import pytest
+
 import numpy as np
 import pandas as pd
 
 from vivarium.framework.util import (from_yearly, to_yearly, rate_to_probability, probability_to_rate,
-                                     collapse_nested_dict, expand_branch_templates)
+                                     collapse_nested_dict, expand_branch_templates, marked_attributes,
+                                     iter_branch_templates, branch_count, get_branch, run_in_fork)
+from vivarium.framework.event import listens_for
+from vivarium.framework.values import produces_value
 
 
 # Simple regression tests for rate functions
@@ -73,3 +78,53 @@ def test_expand_branch_template():
             {'a': {'b': 2, 'c': 3, 'd': 6, 'e':False}},
         ]]
     assert sorted(result) == sorted(expected)
+
+def test_branch_template_indexing():
+    source = [{'a': {'b': [1,2], 'c': 3, 'd': [4,5,6], 'e': [True, False]}}, {'a': {'b': 10, 'c': 30, 'd': 40, 'e':True}}]
+    branches = iter_branch_templates(source)
+    assert not isinstance(branches, list)
+
+    branches = list(branches)
+    assert branches == expand_branch_templates(source)
+    assert branch_count(source) == len(branches) == 13
+    assert [get_branch(source, i) for i in range(13)] == branches
+    assert get_branch(source, 1) == {'a': {'b': 2, 'c': 3, 'd': 4, 'e': True}}
+    with pytest.raises(IndexError):
+        get_branch(source, 13)
+
+def test_marked_attributes():
+    class Component:
+        @listens_for('time_step')
+        def on_time_step(self, event):
+            pass
+
+        @produces_value('test_value')
+        def source(self, index):
+            pass
+
+        def unmarked(self):
+            pass
+
+    component = Component()
+    component.instance_listener = listens_for('time_step')(lambda event: None)
+
+    assert [name for name, _ in marked_attributes(component)] == ['instance_listener', 'on_time_step', 'source']
+    assert [name for name, _ in marked_attributes(Component())] == ['on_time_step', 'source']
+    assert marked_attributes(component)[1][1] == component.on_time_step
+
+
+def test_run_in_fork():
+    state = [1]
+
+    def consume(value):
+        state.append(value)
+        return sum(state)
+
+    def fail():
+        raise KeyError('missing')
+
+    assert run_in_fork(consume, 2) == 3
+    assert run_in_fork(consume, 4) == 5
+    assert state == [1]
+    with pytest.raises(KeyError):
+        run_in_fork(fail)
@@ -1,3 +1,5 @@
+import pickle
+
 import pytest
 
 from vivarium.config_tree import ConfigTree
@@ -152,3 +154,145 @@ def test_unused_keys():
     _ = d.test_key.test_key3
 
     assert not d.unused_keys()
+
+def test_freeze():
+    d = ConfigTree({'test_key': {'test_key2': 'test_value', 'test_key3': 'test_value2'}, 'test_key4': 'test_value3'},
+                   layers=['a', 'b'])
+    d.set_with_metadata('test_key4', 'test_value4', layer='b', source='override')
+    d.freeze()
+
+    with pytest.raises(TypeError):
+        d.test_key4 = 'test_value5'
+    with pytest.raises(AttributeError):
+        _ = d.missing_key
+    with pytest.raises(KeyError):
+        _ = d['test_key.missing_key']
+
+    assert d.test_key4 == 'test_value4'
+    assert d.unused_keys() == {'test_key.test_key2', 'test_key.test_key3'}
+
+    assert d['test_key.test_key2'] == 'test_value'
+    assert d.test_key.test_key3 == 'test_value2'
+    assert d.test_key['test_key3'] == 'test_value2'
+    assert not d.unused_keys()
+
+    assert d.metadata('test_key4')[-1] == {'layer': 'b', 'default': True, 'source': 'override',
+                                           'value': 'test_value4'}
+
+def test_unknown_layer():
+    d = ConfigTree(layers=['a', 'b'])
+    with pytest.raises(KeyError):
+        d.set_with_metadata('test_key', 'test_value', layer='c')
+
+def test_shared_layers():
+    d = ConfigTree({'test_key': {'test_key2': 'test_value'}}, layers=['a', 'b', 'c'])
+    assert d.test_key._layers is d._layers
+    assert d.test_key._children['test_key2']._layers is d._layers
+
+    d.drop_layer('b')
+    assert d.test_key._layers is d._layers
+    assert d.test_key._children['test_key2']._layers is d._layers
+
+def test_pickle():
+    d = ConfigTree(layers=['a', 'b'])
+    d.read_dict({'test_key': {'test_key2': 'test_value'}}, layer='a', source='initial_load')
+    d.read_dict({'test_key': {'test_key2': 'test_value2'}}, layer='b', source='update')
+
+    copy = pickle.loads(pickle.dumps(d))
+    assert copy.test_key.test_key2 == 'test_value2'
+    assert copy.test_key.metadata('test_key2') == d.test_key.metadata('test_key2')
+
+def test_overlay():
+    base = ConfigTree({'test_key': {'test_key2': 'test_value', 'test_key3': 'test_value2'}, 'test_key4': 'test_value3'},
+                      layers=['a', 'b'])
+    with pytest.raises(TypeError):
+        base.overlay()
+    base.freeze()
+
+    d = base.overlay()
+    e = base.overlay()
+    d.read_dict({'test_key': {'test_key2': 'test_value5'}}, layer='b', source='override')
+    d.test_key4 = 'test_value6'
+
+    assert d.test_key.test_key2 == 'test_value5'
+    assert d.test_key.test_key3 == 'test_value2'
+    assert d['test_key4'] == 'test_value6'
+    assert 'test_key4' in d
+    assert d.to_dict() == {'test_key': {'test_key2': 'test_value5', 'test_key3': 'test_value2'},
+                           'test_key4': 'test_value6'}
+    assert d.metadata('test_key.test_key2')[-1]['source'] == 'override'
+
+    assert base.test_key.test_key2 == 'test_value'
+    assert base.test_key4 == 'test_value3'
+    assert e.to_dict() == base.to_dict()
+    assert d.test_key._children['test_key3'] is base.test_key._children['test_key3']
+    assert d.test_key._children['test_key2'] is not base.test_key._children['test_key2']
+
+def test_overlay_reset_layer():
+    base = ConfigTree(layers=['a', 'b'])
+    base.read_dict({'test_key': 'test_value', 'test_key2': 'test_value2'}, layer='a', source='initial_load')
+    base.read_dict({'test_key': 'test_value3', 'test_key2': 'test_value4'}, layer='b', source='update')
+    base.freeze()
+
+    d = base.overlay()
+    d.reset_layer('b', preserve_keys=['test_key2'])
+    assert d.to_dict() == {'test_key': 'test_value', 'test_key2': 'test_value4'}
+    d.drop_layer('b')
+    assert d.to_dict() == {'test_key': 'test_value', 'test_key2': 'test_value2'}
+    assert base.to_dict() == {'test_key': 'test_value3', 'test_key2': 'test_value4'}
+
+    d = base.overlay()
+    d.freeze()
+    assert d.test_key2 == 'test_value4'
+
+def test_rebase():
+    class Component:
+        def __init__(self):
+            self.clock = lambda: 0
+
+    d = ConfigTree(layers=['a', 'b'])
+    d.read_dict({'test_key': {'test_key2': 'test_value'}}, layer='a', source=Component())
+    base = d.frozen_copy()
+    with pytest.raises(TypeError):
+        d.rebase(d)
+
+    d.read_dict({'test_key': {'test_key2': 'test_value2'}, 'test_key3': 'test_value3'}, layer='b', source='update')
+    d.rebase(base)
+    assert d.to_dict() == {'test_key': {'test_key2': 'test_value'}}
+
+    d.test_key.test_key2 = 'test_value4'
+    assert d.test_key.test_key2 == 'test_value4'
+    assert base.test_key.test_key2 == 'test_value'
+    d.rebase(base)
+    assert d.test_key.test_key2 == 'test_value'
+
+    with pytest.raises(TypeError):
+        base.rebase(base)
+
+def test_snapshot_restore():
+    class Component:
+        def __init__(self):
+            self.clock = lambda: 0
+
+        def __str__(self):
+            return 'Component()'
+
+    d = ConfigTree(layers=['a', 'b'])
+    d.read_dict({'test_key': {'test_key2': ['test_value']}, 'test_key3': 'test_value2'}, layer='a', source=Component())
+    state = d.snapshot()
+    pickle.dumps(state)
+
+    d.read_dict({'test_key': {'test_key2': 'test_value3'}, 'test_key4': 'test_value4'}, layer='b', source='update')
+    d.restore(state)
+    assert d.to_dict() == {'test_key': {'test_key2': ['test_value']}, 'test_key3': 'test_value2'}
+    assert d.test_key.metadata('test_key2') == [{'layer': 'a', 'value': ['test_value'], 'source': 'Component()',
+                                                  'default': False}]
+
+    # Restoring doesn't share mutable values with the snapshot
+    d.test_key.test_key2.append('test_value5')
+    d.restore(state)
+    assert d.test_key.test_key2 == ['test_value']
+
+    d.freeze()
+    with pytest.raises(TypeError):
+        d.restore(state)
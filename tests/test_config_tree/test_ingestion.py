@@ -1,6 +1,8 @@
+import pickle
+
 import pytest
 
-from vivarium.config_tree import ConfigTree
+from vivarium.config_tree import ConfigTree, load_yaml
 
 TEST_YAML_ONE = '''
 test_section:
@@ -29,3 +31,18 @@ def test_load_yaml_file(tmpdir):
     assert d.test_section.test_key == 'test_value'
     assert d.test_section.test_key2 == 'test_value2'
     assert d.test_section2.test_key == 'test_value3'
+
+def test_load_yaml_cache(tmpdir, monkeypatch):
+    monkeypatch.setenv('VIVARIUM_YAML_CACHE', str(tmpdir))
+
+    assert load_yaml(TEST_YAML_ONE) == {'test_section': {'test_key': 'test_value', 'test_key2': 'test_value2'},
+                                        'test_section2': {'test_key': 'test_value3', 'test_key2': 'test_value4'}}
+    cache_files = tmpdir.listdir()
+    assert len(cache_files) == 1
+
+    # Subsequent loads of the same document come from the cache rather than the parser.
+    with open(str(cache_files[0]), 'wb') as f:
+        pickle.dump({'test_section': {'test_key': 'cached_value'}}, f)
+    d = ConfigTree()
+    d.loads(TEST_YAML_ONE)
+    assert d.test_section.test_key == 'cached_value'
@@ -0,0 +1,39 @@
+from vivarium.framework.engine import _step
+from vivarium.reference_model import ReferenceModel, measure_throughput
+from vivarium.test_util import setup_simulation
+
+
+def test_reference_model(short_simulation):
+    simulation = setup_simulation([ReferenceModel(causes=2)], population_size=1000)
+    start = simulation.current_time
+    prevalence = []
+    for _ in range(14):
+        susceptible = simulation.population.population.cause_1 == 'susceptible'
+        _step(simulation)
+        population = simulation.population.population
+        prevalence.append((population.cause_0 == 'infected').sum())
+        new_infections = (susceptible & (population.cause_1.reindex(susceptible.index) == 'infected')).sum()
+        if simulation.current_time.quarter != 1:
+            # The second cause is seasonal
+            assert new_infections == 0
+
+    population = simulation.population.population
+    assert len(population) > 1000
+    assert (population.alive == 'dead').sum() > 0
+    assert (population.entrance_time > start).sum() == len(population) - 1000
+    assert set(population.cause_1.unique()) == {'susceptible', 'infected', 'recovered'}
+    assert set(population.cause_0.unique()) == {'susceptible', 'infected'}
+    assert prevalence[-1] > 0
+
+    recorded = simulation.metrics.sink.read('reference_model')
+    assert len(recorded) == 14
+    assert list(recorded.columns) == ['time', 'living', 'deaths', 'births',
+                                      'cause_0_prevalent_cases', 'cause_1_prevalent_cases']
+    assert recorded.births.iloc[-1] == len(population) - 1000
+
+
+def test_measure_throughput(short_simulation):
+    result = measure_throughput(population_size=500, causes=1, steps=2)
+    assert result['simulant_steps'] > 900
+    assert result['simulant_steps_per_second'] > 0
+    assert result['peak_memory_mb'] > 0
@@ -0,0 +1,39 @@
+import os
+import subprocess
+import sys
+from time import time
+
+# Seconds allowed for the simulate script to import everything it needs and parse its arguments.
+STARTUP_BUDGET = float(os.environ.get('VIVARIUM_STARTUP_BUDGET', 5))
+
+REPOSITORY_ROOT = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+
+
+def test_simulate_run_startup_time():
+    simulate = os.path.join(REPOSITORY_ROOT, 'simulate')
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([REPOSITORY_ROOT, os.environ.get('PYTHONPATH', '')]))
+
+    durations = []
+    for _ in range(3):
+        start = time()
+        subprocess.check_call([sys.executable, simulate, 'run', '--help'], env=env, stdout=subprocess.DEVNULL)
+        durations.append(time() - start)
+
+    assert min(durations) < STARTUP_BUDGET, 'simulate start up took {:.2f} seconds'.format(min(durations))
+
+
+def _modules_loaded_by(statement):
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([REPOSITORY_ROOT, os.environ.get('PYTHONPATH', '')]))
+    output = subprocess.check_output(
+        [sys.executable, '-c', '{}; import sys; print("\\n".join(sys.modules))'.format(statement)], env=env)
+    return set(output.decode().split())
+
+
+def test_deferred_imports():
+    assert 'numpy' not in _modules_loaded_by('import vivarium')
+
+    # Only needed by some commands, so they shouldn't slow down the others.
+    loaded = _modules_loaded_by('import vivarium.framework.engine')
+    for module in ['multiprocessing', 'yaml', 'scipy', 'vivarium.framework.metrics', 'vivarium.framework.checkpoint',
+                   'vivarium.framework.results']:
+        assert module not in loaded, '{} is imported with the engine'.format(module)
@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+
+from vivarium import config
+from vivarium.test_util import build_table
+
+
+def test_build_table():
+    start, end = config.simulation_parameters.year_start, config.simulation_parameters.year_end
+    table = build_table(lambda age, sex, year: year - age, columns=('age', 'year', 'sex', 'rate', 'constant'))
+    table['constant'] = build_table(0.25)['rate']
+
+    assert len(table) == 140*(end - start + 1)*2
+    assert list(table.columns) == ['age', 'year', 'sex', 'rate', 'constant']
+    assert list(table.iloc[:3][['age', 'year', 'sex']].itertuples(index=False, name=None)) == [
+        (0, start, 'Male'), (0, start, 'Female'), (0, start+1, 'Male')]
+    assert (table.rate == table.year - table.age).all()
+    assert (table.constant == 0.25).all()
+
+    with pytest.raises(ValueError):
+        build_table([1, 2])
+
+
+def test_build_table_scalar_callable():
+    # Can't be called on arrays, so is called once per row
+    table = build_table(lambda age, sex, year: 1.0 if sex == 'Male' and age < 50 else 0.0)
+    assert (table.rate == ((table.sex == 'Male') & (table.age < 50)).astype(float)).all()
+
+
+def test_build_table_random():
+    np.random.seed(0)
+    table = build_table([None, 1, None], columns=('age', 'year', 'sex', 'a', 'b', 'c'))
+    np.random.seed(0)
+    expected = np.random.random((len(table), 2))
+    assert np.all(table[['a', 'c']].values == expected)
+
+
+def test_build_table_extra_key_columns():
+    table = build_table(lambda age, sex, year, cause: np.where(cause == 'diarrhea', 1, 2),
+                        extra_key_columns={'cause': (c for c in ['diarrhea', 'measles'])})
+
+    assert list(table.columns) == ['age', 'year', 'sex', 'cause', 'rate']
+    assert len(table) == 2*len(build_table(0))
+    assert list(table.cause.iloc[:3]) == ['diarrhea', 'measles', 'diarrhea']
+    assert (table.rate == np.where(table.cause == 'diarrhea', 1, 2)).all()
@@ -1,8 +1,4 @@
 import os
-import yaml
-
-import numpy
-numpy.seterr(all='raise')
 
 from vivarium.config_tree import ConfigTree
 
@@ -23,28 +23,106 @@ For example:
 >>> config.section_b.item1
 'value7'
 """
-import yaml
+from copy import deepcopy
+import hashlib
+import os
+import pickle
+
+
+def load_yaml(data_string):
+    """Parse a yaml document, using libyaml's loader when it is available.
+
+    If the ``VIVARIUM_YAML_CACHE`` environment variable names a directory, parsed documents
+    are pickled there keyed by a hash of their content so that processes reading the same
+    document can skip parsing it.
+
+    Parameters
+    ----------
+    data_string : str
+        yaml formatted string.
+
+    Returns
+    -------
+    The parsed document.
+    """
+    cache_directory = os.environ.get('VIVARIUM_YAML_CACHE')
+    if cache_directory:
+        data_bytes = data_string.encode('utf8') if isinstance(data_string, str) else data_string
+        cache_path = os.path.join(cache_directory, 'yaml-{}.pickle'.format(hashlib.sha1(data_bytes).hexdigest()))
+        try:
+            with open(cache_path, 'rb') as f:
+                return pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            pass
+
+    import yaml  # Deferred to keep start-up fast for configurations which are never loaded from yaml.
+    data = yaml.load(data_string, Loader=getattr(yaml, 'CLoader', yaml.Loader))
+
+    if cache_directory:
+        os.makedirs(cache_directory, exist_ok=True)
+        temp_path = '{}.{}.tmp'.format(cache_path, os.getpid())
+        with open(temp_path, 'wb') as f:
+            pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, cache_path)
+
+    return data
+
+
+def _source_name(source):
+    return source if source is None or isinstance(source, str) else str(source)
+
+
+# Layer tuples are interned so that every node in a tree shares a single copy of its layer names.
+_interned_layers = {}
+
+
+def _intern_layers(layers):
+    layers = tuple(layers) if layers else ('base',)
+    return _interned_layers.setdefault(layers, layers)
 
 
 class ConfigNode:
     """A single configuration value which may have different variants for different layers.
     Each ConfigNode also records the source (if any is reported) from which the value is derived.
+
+    Values are stored as (source, value) pairs in a list indexed by the position of their layer,
+    with None marking layers where the value is not set.
     """
+    __slots__ = ('_layers', '_values', '_frozen', '_accessed')
+
     def __init__(self, layers=None):
-        if not layers:
-            self._layers = ['base']
-        else:
-            self._layers = layers
-        self._values = {}
+        self._layers = _intern_layers(layers)
+        self._values = [None] * len(self._layers)
         self._frozen = False
         self._accessed = False
 
+    def __getstate__(self):
+        return {slot: getattr(self, slot) for slot in self.__slots__}
+
+    def __setstate__(self, state):
+        for slot, value in state.items():
+            setattr(self, slot, value)
+        self._layers = _intern_layers(self._layers)
+
+    def _layer_position(self, layer):
+        try:
+            return self._layers.index(layer)
+        except ValueError:
+            raise KeyError(layer)
+
     def freeze(self):
         """Causes the node to become read only. This is useful for loading and then
         freezing configurations that should not be modified at runtime.
         """
         self._frozen = True
 
+    def copy(self):
+        """Returns an unfrozen copy of this node which shares no mutable state with it."""
+        node = ConfigNode(self._layers)
+        node._values = list(self._values)
+        node._accessed = self._accessed
+        return node
+
     def get_value_with_source(self, layer=None):
         """Returns a tuple of the value's source and the value at the specified
         layer. If no layer is specified then the outer layer is used.
@@ -61,15 +139,18 @@ class ConfigNode:
             If the value is not set for the specified layer
         """
         if layer:
-            return self._values[layer]
-
-        for layer in reversed(self._layers):
-            if layer in self._values:
-                return self._values[layer]
+            value = self._values[self._layer_position(layer)]
+            if value is None:
+                raise KeyError(layer)
+            return value
+
+        for value in reversed(self._values):
+            if value is not None:
+                return value
         raise KeyError(layer)
 
     def is_empty(self):
-        return not self._values
+        return all(value is None for value in self._values)
 
     def get_value(self, layer=None):
         """Returns the value at the specified layer.
@@ -104,12 +185,12 @@ class ConfigNode:
         is indicated by the `default` flag.
         """
         result = []
-        for layer in self._layers:
-            if layer in self._values:
+        for layer, value in zip(self._layers, self._values):
+            if value is not None:
                 result.append({
                     'layer': layer,
-                    'value': self._values[layer][1],
-                    'source': self._values[layer][0],
+                    'value': value[1],
+                    'source': value[0],
                     'default': layer == self._layers[-1]
                 })
         return result
@@ -138,8 +219,10 @@ class ConfigNode:
             raise TypeError('Frozen ConfigNode does not support assignment')
 
         if not layer:
-            layer = self._layers[-1]
-        self._values[layer] = (source, value)
+            position = len(self._layers) - 1
+        else:
+            position = self._layer_position(layer)
+        self._values[position] = (source, value)
 
     def drop_layer(self, layer):
         """Removes the named layer and the value associated with it from the node.
@@ -153,13 +236,14 @@ class ConfigNode:
         ------
         TypeError
             If the node is frozen
-        KeyError
+        ValueError
             If the named layer does not exist
         """
         if self._frozen:
             raise TypeError('Frozen ConfigNode does not support modification')
-        self.reset_layer(layer)
-        self._layers.remove(layer)
+        position = self._layers.index(layer)
+        self._layers = _intern_layers(self._layers[:position] + self._layers[position+1:])
+        del self._values[position]
 
     def reset_layer(self, layer):
         """Removes any value and metadata associated with the named layer.
@@ -178,23 +262,29 @@ class ConfigNode:
         """
         if self._frozen:
             raise TypeError('Frozen ConfigNode does not support modification')
-        if layer in self._values:
-            del self._values[layer]
+        if layer in self._layers:
+            self._values[self._layers.index(layer)] = None
 
     def __repr__(self):
+        values = {layer: value for layer, value in zip(self._layers, self._values) if value is not None}
         return 'ConfigNode(layers={}, values={}, frozen={}, accessed={})'.format(
-            self._layers, self._values, self._frozen, self._accessed)
+            list(self._layers), values, self._frozen, self._accessed)
 
     def __str__(self):
         return '\n'.join(reversed(['{}: {}\n    source: {}'.format(layer, value[1], value[0])
-                                   for layer, value in self._values.items()]))
+                                   for layer, value in zip(self._layers, self._values) if value is not None]))
 
 
 class ConfigTree:
     """A container for configuration information. Each configuration value is
     exposed as an attribute the value of which is determined by the outermost
     layer which has the key defined.
+
+    A frozen ConfigTree can serve as the shared base for any number of overlays (see `overlay`)
+    which only store the values that are set on them.
     """
+    __slots__ = ('_layers', '_children', '_frozen', '_flat', '_base')
+
     def __init__(self, data=None, layers=None):
         """
         Parameters
@@ -205,12 +295,11 @@ class ConfigTree:
             A list of layer names. The order in which layers defined determines
             how they cascade. Later layers override the values from earlier ones.
         """
-        if not layers:
-            self.__dict__['_layers'] = ['base']
-        else:
-            self.__dict__['_layers'] = layers
-        self.__dict__['_children'] = {}
-        self.__dict__['_frozen'] = False
+        object.__setattr__(self, '_layers', _intern_layers(layers))
+        object.__setattr__(self, '_children', {})
+        object.__setattr__(self, '_frozen', False)
+        object.__setattr__(self, '_flat', None)
+        object.__setattr__(self, '_base', None)
 
         if data:
             self.read_dict(data, layer=self._layers[0], source='initial data')
@@ -219,11 +308,92 @@ class ConfigTree:
         """Causes the ConfigTree to become read only.
 
         This is useful for loading and then freezing configurations that should not be modified at runtime.
+        Since the values can no longer change, they are resolved once and stored in a flat dictionary keyed
+        by both child names and dotted paths (e.g. ``'simulation_parameters.time_step'``) so that reads from
+        a frozen tree are a single lookup.
         """
-        self.__dict__['_frozen'] = True
-        for child in self._children.values():
+        object.__setattr__(self, '_frozen', True)
+        for child in self._materialize(detach=True).values():
             child.freeze()
 
+        flat = {}
+        for name, child in self._children.items():
+            if isinstance(child, ConfigTree):
+                flat.update(('{}.{}'.format(name, key), entry) for key, entry in child._flat.items())
+        for name, child in self._children.items():
+            if isinstance(child, ConfigTree):
+                flat[name] = (None, child)
+            elif not child.is_empty():
+                flat[name] = (child, child.get_value_with_source()[1])
+        object.__setattr__(self, '_flat', flat)
+
+    def overlay(self):
+        """Create a copy-on-write ConfigTree layered over this one.
+
+        The overlay reads through to this tree for any key it has not overridden and only
+        stores the values set on it directly, so many overlays can share a single base.
+        Values in the base are copied into the overlay the first time they are modified.
+        Reading a value through an overlay marks it as accessed in the shared base.
+
+        Returns
+        -------
+        ConfigTree
+            An unfrozen tree with the same layers and values as this one.
+
+        Raises
+        ------
+        TypeError
+            If this tree is not frozen.
+        """
+        if not self._frozen:
+            raise TypeError('Only a frozen ConfigTree can be used as the base of an overlay')
+        tree = ConfigTree(layers=self._layers)
+        object.__setattr__(tree, '_base', self)
+        return tree
+
+    def _child(self, name):
+        """Get the named child, pulling it through from the base tree if this is an overlay.
+
+        Subtrees of the base are wrapped in overlays of their own while nodes are shared
+        until they are written to.  Returns None if there is no such child.
+        """
+        child = self._children.get(name)
+        if child is None and self._base is not None:
+            child = self._base._children.get(name)
+            if isinstance(child, ConfigTree):
+                child = self._children[name] = child.overlay()
+        return child
+
+    def _materialize(self, detach=False):
+        """Pull every child of the base tree through to this one and return the children.
+
+        With ``detach`` the tree stops reading through to its base afterwards, which is
+        needed before keys are removed from it.
+        """
+        if self._base is not None:
+            if len(self._children) < len(self._base._children):
+                for name in self._base._children:
+                    if name not in self._children:
+                        self._children[name] = self._child(name)
+            if detach:
+                object.__setattr__(self, '_base', None)
+        return self._children
+
+    def _writable_node(self, name):
+        """Get the named node, copying it first if it is shared with a base tree."""
+        child = self._children.get(name)
+        if child is None or child._frozen:
+            child = self._children[name] = self._child(name).copy()
+        return child
+
+    def __getstate__(self):
+        return {slot: getattr(self, slot) for slot in self.__slots__}
+
+    def __setstate__(self, state):
+        for slot, value in state.items():
+            object.__setattr__(self, slot, value)
+        object.__setattr__(self, '_layers', _intern_layers(self._layers))
+
     def __setattr__(self, name, value):
         """Set a configuration value on the outermost layer."""
         self.set_with_metadata(name, value, layer=None, source=None)
@@ -234,26 +404,45 @@ class ConfigTree:
 
     def __getattr__(self, name):
         """Get a configuration value from the outermost layer in which it appears."""
+        if name in ConfigTree.__slots__ or (name.startswith('__') and name.endswith('__')):
+            # Internal state that isn't set yet (e.g. during unpickling) or a protocol lookup.
+            raise AttributeError(name)
+        if self._frozen:
+            try:
+                return self._get_frozen(name)
+            except KeyError:
+                raise AttributeError(name)
         try:
             return self.get_from_layer(name)
         except KeyError:
             raise AttributeError(name)
 
     def __getitem__(self, name):
-        """Get a configuration value from the outermost layer in which it appears."""
+        """Get a configuration value from the outermost layer in which it appears.
+
+        Frozen trees also accept dotted paths to values in nested trees."""
+        if self._frozen:
+            return self._get_frozen(name)
         return self.get_from_layer(name)
 
+    def _get_frozen(self, name):
+        node, value = self._flat[name]
+        if node is not None:
+            # Keep access tracking consistent with ConfigNode.get_value
+            node._accessed = True
+        return value
+
     def __contains__(self, name):
         """Test if a configuration key exists in any layer."""
-        return name in self._children
+        return name in self._children or (self._base is not None and name in self._base)
 
     def __iter__(self):
         """Dictionary-like iteration."""
-        return iter(self._children)
+        return iter(self._materialize())
 
     def items(self):
         """Return a list of all (child_name, child) pairs."""
-        return self._children.items()
+        return self._materialize().items()
 
     def get_from_layer(self, name, layer=None):
         """Get a configuration value from the named layer.
@@ -265,11 +454,13 @@ class ConfigTree:
             The name of the layer to retrieve the value from. If it is not supplied
             then the outermost layer in which the key is defined will be used.
         """
-        if name not in self._children:
+        if self._frozen and layer is None:
+            return self._get_frozen(name)
+        child = self._child(name)
+        if child is None:
             if self._frozen:
                 raise KeyError(name)
-            self._children[name] = ConfigTree(layers=self._layers)
-        child = self._children[name]
+            child = self._children[name] = ConfigTree(layers=self._layers)
         if isinstance(child, ConfigNode):
             return child.get_value(layer)
         else:
@@ -297,14 +488,16 @@ class ConfigTree:
         if self._frozen:
             raise TypeError('Frozen ConfigTree does not support assignment')
 
+        child = self._child(name)
         if isinstance(value, dict):
-            if name not in self._children or not isinstance(self._children[name], ConfigTree):
-                self._children[name] = ConfigTree(layers=list(self._layers))
-            self._children[name].read_dict(value, layer, source)
+            if not isinstance(child, ConfigTree):
+                child = self._children[name] = ConfigTree(layers=self._layers)
+            child.read_dict(value, layer, source)
         else:
-            if name not in self._children or not isinstance(self._children[name], ConfigNode):
-                self._children[name] = ConfigNode(list(self._layers))
-            child = self._children[name]
+            if not isinstance(child, ConfigNode):
+                child = self._children[name] = ConfigNode(self._layers)
+            elif child._frozen:
+                child = self._writable_node(name)
             child.set_value(value, layer, source)
 
     def read_dict(self, data_dict, layer=None, source=None):
@@ -336,7 +529,7 @@ class ConfigTree:
         source : str
             Source to attribute the values to
         """
-        data_dict = yaml.load(data_string)
+        data_dict = load_yaml(data_string)
         self.read_dict(data_dict, layer, source)
 
     def load(self, f, layer=None, source=None):
@@ -358,9 +551,99 @@ class ConfigTree:
             with open(f) as f:
                 self.loads(f.read(), layer=layer, source=source)
 
+    def snapshot(self):
+        """Capture the values in this tree so that they can be put back later with `restore`.
+
+        Unlike a pickled copy of the tree, a snapshot can be taken whatever the values' sources
+        are.  Sources which aren't strings, like components that supplied configuration defaults,
+        are recorded by their ``str``.  The snapshot only holds built in types and the values
+        themselves, so it can be pickled whenever the values can.
+
+        Returns
+        -------
+        dict
+        """
+        children = {}
+        for name, child in self._materialize().items():
+            if isinstance(child, ConfigNode):
+                values = [None if value is None else (_source_name(value[0]), deepcopy(value[1]))
+                          for value in child._values]
+                children[name] = (list(child._layers), values, child._accessed)
+            else:
+                children[name] = child.snapshot()
+        return {'layers': list(self._layers), 'children': children}
+
+    def restore(self, snapshot):
+        """Replace everything in this tree with the values captured by `snapshot`.
+
+        Parameters
+        ----------
+        snapshot : dict
+
+        Raises
+        ------
+        TypeError
+            If the tree is frozen.
+        """
+        if self._frozen:
+            raise TypeError('Frozen ConfigTree does not support modification')
+        children = {}
+        for name, child in snapshot['children'].items():
+            if isinstance(child, dict):
+                children[name] = ConfigTree(layers=child['layers'])
+                children[name].restore(child)
+            else:
+                layers, values, accessed = child
+                node = children[name] = ConfigNode(layers)
+                node._values = [None if value is None else (value[0], deepcopy(value[1])) for value in values]
+                node._accessed = accessed
+        object.__setattr__(self, '_layers', _intern_layers(snapshot['layers']))
+        object.__setattr__(self, '_children', children)
+        object.__setattr__(self, '_flat', None)
+        object.__setattr__(self, '_base', None)
+
+    def frozen_copy(self):
+        """Get a frozen copy of this tree to use as the shared base of overlays, see `overlay`.
+
+        Like `snapshot` this works whatever the sources of the values are, which are recorded by
+        their ``str``.
+
+        Returns
+        -------
+        ConfigTree
+        """
+        tree = ConfigTree()
+        tree.restore(self.snapshot())
+        tree.freeze()
+        return tree
+
+    def rebase(self, base):
+        """Replace everything in this tree with an overlay of the frozen tree ``base``.
+
+        This resets a tree which is shared by reference, like the global configuration, to a
+        known state without copying any of the values in ``base``, see `overlay`.
+
+        Parameters
+        ----------
+        base : ConfigTree
+
+        Raises
+        ------
+        TypeError
+            If this tree is frozen or ``base`` is not.
+        """
+        if self._frozen:
+            raise TypeError('Frozen ConfigTree does not support modification')
+        if not base._frozen:
+            raise TypeError('Only a frozen ConfigTree can be used as the base of an overlay')
+        object.__setattr__(self, '_layers', base._layers)
+        object.__setattr__(self, '_children', {})
+        object.__setattr__(self, '_flat', None)
+        object.__setattr__(self, '_base', base)
+
     def to_dict(self):
         result = {}
-        for k, v in self._children.items():
+        for k, v in self._materialize().items():
             if isinstance(v, ConfigNode):
                 result[k] = v.get_value()
             else:
@@ -380,12 +663,12 @@ class ConfigTree:
         KeyError
             if name is not defined in the ConfigTree
         """
-        if name in self._children:
-            return self._children[name].metadata()
+        if name in self:
+            return self._child(name).metadata()
         else:
             head, _, tail = name.partition('.')
-            if head in self._children:
-                return self._children[head].metadata(key=tail)
+            if head in self:
+                return self._child(head).metadata(tail)
             else:
                 raise KeyError(name)
 
@@ -412,11 +695,12 @@ class ConfigTree:
         if self._frozen:
             raise TypeError('Frozen ConfigTree does not support modification')
         deletable = []
-        for key, child in self._children.items():
+        for key, child in list(self._materialize(detach=True).items()):
             if prefix + [key] not in preserve_keys:
                 if isinstance(child, ConfigTree):
                     child._reset_layer(layer, preserve_keys, prefix + [key])
                 else:
+                    child = self._writable_node(key)
                     child.reset_layer(layer)
                     if child.is_empty():
                         deletable.append(key)
@@ -435,20 +719,23 @@ class ConfigTree:
         ------
         TypeError
             If the node is frozen
-        KeyError
+        ValueError
             If the named layer does not exist
         """
         if self._frozen:
             raise TypeError('Frozen ConfigTree does not support modification')
-        for child in self._children.values():
+        position = self._layers.index(layer)
+        for key, child in list(self._materialize(detach=True).items()):
+            if isinstance(child, ConfigNode):
+                child = self._writable_node(key)
             child.drop_layer(layer)
-        self._layers.remove(layer)
+        object.__setattr__(self, '_layers', _intern_layers(self._layers[:position] + self._layers[position+1:]))
 
     def unused_keys(self):
         """Lists all keys which are present in the ConfigTree but which have not been accessed.
         """
         unused = set()
-        for k, c in self._children.items():
+        for k, c in self._materialize().items():
             if isinstance(c, ConfigNode):
                 if not c.has_been_accessed():
                     unused.add(k)
@@ -458,15 +745,15 @@ class ConfigTree:
         return unused
 
     def __len__(self):
-        return len(self._children)
+        return len(self._materialize())
 
     def __dir__(self):
-        return list(self._children.keys()) + dir(super(ConfigTree, self))
+        return list(self._materialize().keys()) + dir(super(ConfigTree, self))
 
     def __repr__(self):
         return 'ConfigTree(children={}, frozen={})'.format(
-            ' '.join([repr(c) for c in self._children.values()]), self._frozen)
+            ' '.join([repr(c) for c in self._materialize().values()]), self._frozen)
 
     def __str__(self):
         return '\n'.join(['{}:\n    {}'.format(name, str(c).replace('\n', '\n    '))
-                          for name, c in self._children.items()])
+                          for name, c in self._materialize().items()])
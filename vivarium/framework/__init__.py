@@ -0,0 +1,3 @@
+import numpy
+# Set here rather than in the vivarium package so that reading the configuration doesn't load numpy.
+numpy.seterr(all='raise')
@@ -0,0 +1,108 @@
+"""Saving the state of a running simulation so that it can be resumed later.
+
+A checkpoint holds the population table, the clock and step size and the state of every
+component which can save it.  Components opt in by defining ``get_state`` which returns
+something picklable describing any state they keep outside the population table and
+``set_state`` which restores it.  Because common random numbers are keyed on simulant id and
+simulation time, a resumed simulation produces the same results as one which was never
+interrupted, so long as all of its state is either in the population table or saved by its
+components and it does not draw from numpy's global random state.
+"""
+import os
+import pickle
+import zlib
+
+import pandas as pd
+
+from vivarium import config, VivariumError
+
+_MAGIC = b'VIVCKPT1\n'
+
+
+class CheckpointError(VivariumError):
+    """Raised when a checkpoint can't be restored into a simulation."""
+    pass
+
+
+def _stateful_components(simulation):
+    seen = set()
+    components = []
+    for component in simulation.component_manager.components:
+        if id(component) not in seen and hasattr(component, 'get_state') and hasattr(component, 'set_state'):
+            seen.add(id(component))
+            components.append(component)
+    return components
+
+
+def _draws():
+    return config.run_configuration.draw_number, config.run_configuration.model_draw_number
+
+
+def save_checkpoint(simulation, path):
+    """Write the state of ``simulation`` to ``path``, replacing any existing checkpoint atomically.
+
+    Parameters
+    ----------
+    simulation : `vivarium.framework.engine.SimulationContext`
+    path : str
+    """
+    population = simulation.population._population
+    components = _stateful_components(simulation)
+    state = {
+        'draws': _draws(),
+        'current_time': simulation.current_time,
+        'step_size': simulation.step_size,
+        'next_id': simulation.population._next_id,
+        'population': {
+            'index': population.index,
+            'columns': [(name, population[name].values) for name in population.columns],
+        },
+        'component_types': [type(component).__qualname__ for component in components],
+        'components': [component.get_state() for component in components],
+    }
+    data = _MAGIC + zlib.compress(pickle.dumps(state, protocol=pickle.HIGHEST_PROTOCOL))
+
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    temporary_path = '{}.{}.tmp'.format(path, os.getpid())
+    with open(temporary_path, 'wb') as f:
+        f.write(data)
+    os.replace(temporary_path, path)
+
+
+def load_checkpoint(simulation, path):
+    """Restore the state saved in ``path`` into ``simulation``, which must already be set up.
+
+    Parameters
+    ----------
+    simulation : `vivarium.framework.engine.SimulationContext`
+    path : str
+
+    Raises
+    ------
+    CheckpointError
+        If the checkpoint was made with different draws or components than ``simulation`` has.
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+    if not data.startswith(_MAGIC):
+        raise CheckpointError('{} is not a simulation checkpoint'.format(path))
+    state = pickle.loads(zlib.decompress(data[len(_MAGIC):]))
+
+    if tuple(state['draws']) != _draws():
+        raise CheckpointError('Checkpoint was made for draws {} but the simulation is running draws {}'.format(
+            tuple(state['draws']), _draws()))
+    components = _stateful_components(simulation)
+    component_types = [type(component).__qualname__ for component in components]
+    if component_types != state['component_types']:
+        raise CheckpointError('Checkpoint was made with components {} but the simulation has {}'.format(
+            state['component_types'], component_types))
+
+    population = state['population']
+    simulation.population._population = pd.DataFrame(dict(population['columns']), index=population['index'],
+                                                     columns=[name for name, _ in population['columns']])
+    simulation.population._next_id = state['next_id']
+    simulation.current_time = state['current_time']
+    simulation.step_size = state['step_size']
+    for component, component_state in zip(components, state['components']):
+        component.set_state(component_state)
@@ -2,14 +2,23 @@
 ComponentManager class which uses those tools to load and manage components.
 """
 import ast
-from collections import Iterable
+from collections import Iterable, deque
+from copy import deepcopy
+from functools import lru_cache
+import hashlib
 from importlib import import_module
 import inspect
+import os
+import pickle
+from time import time
 from typing import Tuple, Callable, Sequence, Mapping, Union, List
 
 from vivarium import config
 from vivarium import VivariumError
 
+import logging
+_log = logging.getLogger(__name__)
+
 
 class ComponentConfigError(VivariumError):
     """Error while interpreting configuration file or initializing components"""
@@ -27,8 +36,13 @@ class DummyDatasetManager:
         self.constructors = {}
 
 
+# Parsed component definitions keyed by the definition string. See _component_spec.
+_component_specs = {}
+
+
+@lru_cache(maxsize=None)
 def _import_by_path(path: str) -> Callable:
-    """Import a class or function given it's absolute path.
+    """Import a class or function given it's absolute path. Results are cached.
 
     Parameters
     ----------
@@ -86,14 +100,25 @@ class ComponentManager:
         self.component_config = component_config
         self.components = []
         self.dataset_manager = dataset_manager
+        self.component_graph = []
+        self.setup_times = []
 
     def load_components_from_config(self):
         """Load and initialize (if necessary) any components listed in the config and register them with
         the ComponentManager.
         """
 
-        component_list = _extract_component_list(self.component_config)
-        component_list = _prep_components(component_list, self.dataset_manager.constructors)
+        component_descriptions = _extract_component_list(self.component_config)
+
+        cache_path = None
+        if 'vivarium' in config and 'component_cache_directory' in config.vivarium:
+            cache_path = _component_spec_cache_path(config.vivarium.component_cache_directory, component_descriptions)
+            _load_component_specs(cache_path)
+
+        component_list = _prep_components(component_descriptions, self.dataset_manager.constructors)
+
+        if cache_path:
+            _save_component_specs(cache_path, component_descriptions)
 
         new_components = []
         for component in component_list:
@@ -119,37 +144,56 @@ class ComponentManager:
         """Apply component level configuration defaults to the global config and run setup methods on the components
         registering and setting up any child components generated in the process.
 
+        As a side effect the parent/child relationships discovered are recorded in ``component_graph`` as
+        (parent, child) pairs, with a parent of None for top level components, and the wall clock time spent
+        in each component's setup method is recorded in ``setup_times`` as (component, seconds) pairs.
+
         Parameters
         ----------
         builder:
             Interface to several simulation tools.
         """
 
-        done = []
+        # Components are tracked by identity since they need not be hashable and may define __eq__.
+        done = set()
+        self.component_graph = []
+        self.setup_times = []
 
-        components = list(self.components)
+        components = deque((None, component) for component in self.components)
         while components:
-            component = components.pop(0)
+            parent, component = components.popleft()
             if component is None:
                 raise ComponentConfigError('None in component list. This likely indicates a bug in a factory function')
 
             if isinstance(component, Iterable):
                 # Unpack lists of components so their constituent components get initialized
-                components.extend(component)
-                self.components.extend(component)
+                children = list(component)
+                components.extend((parent, child) for child in children)
+                self.components.extend(children)
+                self.component_graph.extend((parent, child) for child in children)
 
-            if component not in done:
+            if id(component) not in done:
                 if hasattr(component, 'configuration_defaults'):
                     # This reapplies configuration from some components but
                     # it is idempotent so there's no effect.
                     config.read_dict(component.configuration_defaults, layer='component_configs', source=component)
 
                 if hasattr(component, 'setup'):
+                    start = time()
                     sub_components = component.setup(builder)
-                    done.append(component)
+                    self.setup_times.append((component, time() - start))
+                    done.add(id(component))
                     if sub_components:
-                        components.extend(sub_components)
+                        sub_components = list(sub_components)
+                        components.extend((component, child) for child in sub_components)
                         self.components.extend(sub_components)
+                        self.component_graph.extend((component, child) for child in sub_components)
+
+        if _log.isEnabledFor(logging.DEBUG):
+            total = sum(duration for _, duration in self.setup_times)
+            _log.debug('Set up %s components in %.3f seconds', len(self.setup_times), total)
+            for component, duration in sorted(self.setup_times, key=lambda x: -x[1])[:20]:
+                _log.debug('    %.3f seconds: %r', duration, component)
 
 
 def _extract_component_list(component_config: Mapping[str, Union[str, Mapping]]) -> Sequence[str]:
@@ -213,9 +257,8 @@ def _is_literal(expression: ast.AST) -> bool:
 
     Notes
     -----
-    Since this is almost certainly used as a guard around a call to literal_eval it means the evaluation happens twice
-    where it could have happened once. But so long as you are looking at a moderate number of small expressions the cost
-    should be minimal compared to the clarity of having a clear predicate.
+    Component parsing evaluates arguments with literal_eval directly in _component_spec rather than using
+    this predicate as a guard, which would evaluate every literal twice.
 
     Parameters
     ----------
@@ -230,6 +273,46 @@ def _is_literal(expression: ast.AST) -> bool:
     return True
 
 
+def _component_spec(definition: str) -> Tuple[str, Tuple]:
+    """Parse a component definition into an importable path and a description of its arguments.
+
+    The result does not depend on the available constructors so it is cached by definition.
+    Each argument is described by a tuple whose first element is one of 'literal', 'constructor'
+    or 'invalid'.  Literals carry their value and constructors carry the constructor name along
+    with its string argument.
+
+    Parameters
+    ----------
+    definition
+        The component definition
+    """
+
+    if definition in _component_specs:
+        return _component_specs[definition]
+
+    component, args = _extract_component_call(ast.parse(definition))
+    component = _component_ast_to_path(component)
+
+    arg_specs = []
+    for arg in args:
+        try:
+            arg_specs.append(('literal', ast.literal_eval(arg)))
+        except ValueError:
+            if isinstance(arg, ast.Call):
+                constructor_args = arg.args
+                # NOTE: This currently precludes arguments other than strings.
+                # May want to release that constraint later.
+                if (isinstance(arg.func, ast.Name)
+                        and len(constructor_args) == 1 and isinstance(constructor_args[0], ast.Str)):
+                    arg_specs.append(('constructor', arg.func.id, constructor_args[0].s))
+                else:
+                    arg_specs.append(('invalid',))
+
+    spec = (component, tuple(arg_specs))
+    _component_specs[definition] = spec
+    return spec
+
+
 def _parse_component(definition: str, constructors: Mapping[str, Callable]) -> Tuple[str, Sequence]:
     """Parse a component definition in a subset of python syntax and return an importable
     path to the specified component along with the arguments it should receive when invoked.
@@ -247,29 +330,52 @@ def _parse_component(definition: str, constructors: Mapping[str, Callable]) -> T
         Dictionary of callables for creating argument objects
     """
 
-    component, args = _extract_component_call(ast.parse(definition))
-    component = _component_ast_to_path(component)
+    component, arg_specs = _component_spec(definition)
 
     transformed_args = []
-    for arg in args:
-        if _is_literal(arg):
-            transformed_args.append(ast.literal_eval(arg))
+    for arg_spec in arg_specs:
+        if arg_spec[0] == 'literal':
+            # Copy so that components can't alter the cached value.
+            transformed_args.append(deepcopy(arg_spec[1]))
         else:
-            if isinstance(arg, ast.Call):
-                constructor = arg.func.id
-                constructor_args = arg.args
-
-                constructor = constructors.get(constructor)
-                # NOTE: This currently precludes arguments other than strings.
-                # May want to release that constraint later.
-                if constructor and len(constructor_args) == 1 and isinstance(constructor_args[0], ast.Str):
-                    transformed_args.append(constructor(constructor_args[0].s))
-                else:
-                    raise ParsingError('Invalid syntax: {}'.format(definition))
+            constructor = constructors.get(arg_spec[1]) if arg_spec[0] == 'constructor' else None
+            if constructor:
+                transformed_args.append(constructor(arg_spec[2]))
+            else:
+                raise ParsingError('Invalid syntax: {}'.format(definition))
 
     return component, transformed_args
 
 
+def _component_spec_cache_path(cache_directory: str, component_list: Sequence) -> str:
+    """Get the path of the on disk cache of parsed definitions for a list of component descriptions."""
+    key = hashlib.sha1('\n'.join(c for c in component_list if isinstance(c, str)).encode('utf8')).hexdigest()
+    return os.path.join(cache_directory, 'components-{}.pickle'.format(key))
+
+
+def _load_component_specs(cache_path: str):
+    """Load previously parsed component definitions from disk into the in-process cache."""
+    try:
+        with open(cache_path, 'rb') as f:
+            _component_specs.update(pickle.load(f))
+    except FileNotFoundError:
+        pass
+    except Exception:
+        _log.warning('Ignoring unreadable component cache %s', cache_path, exc_info=True)
+
+
+def _save_component_specs(cache_path: str, component_list: Sequence):
+    """Write the parsed definitions for a list of component descriptions to disk if they aren't already there."""
+    if os.path.exists(cache_path):
+        return
+    specs = {c: _component_specs[c] for c in component_list if isinstance(c, str) and c in _component_specs}
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    temp_path = '{}.{}.tmp'.format(cache_path, os.getpid())
+    with open(temp_path, 'wb') as f:
+        pickle.dump(specs, f)
+    os.replace(temp_path, cache_path)
+
+
 def _prep_components(component_list: Sequence, constructors: Mapping[str, Callable]) -> Sequence:
     """Transform component description strings into tuples of component callables and arguments the component may need.
 
@@ -296,10 +402,11 @@ def _prep_components(component_list: Sequence, constructors: Mapping[str, Callab
 
             component = _import_by_path(component)
 
-            for attr, val in inspect.getmembers(component, lambda a: not inspect.isroutine(a)):
-                constructor = constructors.get(val.__class__)
-                if constructor:
-                    setattr(component, attr, constructor(val))
+            if constructors:
+                for attr, val in inspect.getmembers(component, lambda a: not inspect.isroutine(a)):
+                    constructor = constructors.get(val.__class__)
+                    if constructor:
+                        setattr(component, attr, constructor(val))
 
             # Establish the initial configuration
             if hasattr(component, 'configuration_defaults'):
@@ -1,17 +1,18 @@
 """The engine."""
 import argparse
 from bdb import BdbQuit
+from copy import deepcopy
 import gc
+import numbers
 import os
 import os.path
 from pprint import pformat, pprint
 from time import time
 
-import yaml
-
 import pandas as pd
 
-from vivarium import config
+from vivarium import config, VivariumError
+from vivarium.config_tree import ConfigTree, load_yaml
 
 from vivarium.framework.values import ValuesManager
 from vivarium.framework.event import EventManager, Event, emits
@@ -19,7 +20,8 @@ from vivarium.framework.population import PopulationManager, creates_simulants
 from vivarium.framework.lookup import InterpolatedDataManager
 from vivarium.framework.components import load_component_manager
 from vivarium.framework.randomness import RandomnessStream
-from vivarium.framework.util import collapse_nested_dict
+from vivarium.framework.util import (collapse_nested_dict, branch_count, get_branch, iter_branch_templates,
+                                     run_in_fork)
 
 import logging
 _log = logging.getLogger(__name__)
@@ -35,9 +37,15 @@ class Builder:
         self.population_view = context.population.get_view
         self.clock = lambda: lambda: context.current_time
         self.step_size = lambda: lambda: context.step_size
+        self.metrics_sink = lambda: context.metrics.sink
         input_draw_number = config.run_configuration.draw_number
         model_draw_number = config.run_configuration.model_draw_number
-        self.randomness = lambda key: RandomnessStream(key, self.clock(), (input_draw_number, model_draw_number))
+
+        def randomness(key):
+            stream = RandomnessStream(key, self.clock(), (input_draw_number, model_draw_number))
+            context.randomness_streams.append(stream)
+            return stream
+        self.randomness = randomness
 
     def __repr__(self):
         return "Builder()"
@@ -45,21 +53,31 @@ class Builder:
 
 class SimulationContext:
     """context"""
-    def __init__(self, component_manager):
+    def __init__(self, component_manager, shard=None):
+        from vivarium.framework.metrics import MetricsManager
+
         self.component_manager = component_manager
         self.values = ValuesManager()
         self.events = EventManager()
-        self.population = PopulationManager()
+        self.population = PopulationManager(shard)
         self.tables = InterpolatedDataManager()
+        self.metrics = MetricsManager()
         self.current_time = None
         self.step_size = pd.Timedelta(0, unit='D')
+        self.randomness_streams = []
 
     def update_time(self):
         self.current_time += self.step_size
 
+    def set_model_draw(self, model_draw_number):
+        """Reseed every randomness stream handed out during setup for a different model draw."""
+        for stream in self.randomness_streams:
+            input_draw_number, _ = stream.seed
+            stream.set_seed((input_draw_number, model_draw_number))
+
     def setup(self):
         builder = Builder(self)
-        self.component_manager.add_components([self.values, self.events, self.population, self.tables])
+        self.component_manager.add_components([self.values, self.events, self.population, self.tables, self.metrics])
         self.component_manager.load_components_from_config()
         self.component_manager.setup_components(builder)
 
@@ -100,13 +118,8 @@ def _get_time(suffix):
         return pd.Timestamp(params['year_{}'.format(suffix)], 7, 2)
 
 
-@creates_simulants
-@emits('simulation_end')
-def event_loop(simulation, simulant_creator, end_emitter):
-    start = _get_time('start')
-    stop = _get_time('end')
-
-    simulation.current_time = start
+def _initialize_population(simulation, simulant_creator):
+    simulation.current_time = _get_time('start')
 
     population_size = config.simulation_parameters.population_size
 
@@ -118,27 +131,85 @@ def event_loop(simulation, simulant_creator, end_emitter):
 
     simulation.step_size = pd.Timedelta(config.simulation_parameters.time_step, unit='D')
 
+
+@creates_simulants
+@emits('simulation_end')
+def event_loop(simulation, simulant_creator, end_emitter, checkpoint_path=None, checkpoint_interval=None,
+               resume=False):
+    """Run the simulation from its start, or from a checkpoint, to its end.
+
+    Parameters
+    ----------
+    simulation : SimulationContext
+    checkpoint_path : str
+        Where to save checkpoints, see `vivarium.framework.checkpoint`.
+    checkpoint_interval : int
+        Save a checkpoint after every this many time steps.
+    resume : bool
+        Continue from the checkpoint at ``checkpoint_path`` if there is one rather than starting over.
+    """
+    stop = _get_time('end')
+
+    resume = bool(resume and checkpoint_path and os.path.exists(checkpoint_path))
+    simulation.metrics.start_run(resume=resume)
+    if resume:
+        from vivarium.framework.checkpoint import load_checkpoint
+
+        _log.info('Resuming from checkpoint %s', checkpoint_path)
+        load_checkpoint(simulation, checkpoint_path)
+    else:
+        _initialize_population(simulation, simulant_creator)
+
+    _run_until(simulation, stop, checkpoint_path, checkpoint_interval)
+
+    end_emitter(Event(simulation.population.population.index))
+
+
+def _run_until(simulation, stop, checkpoint_path=None, checkpoint_interval=None):
+    steps = 0
     while simulation.current_time < stop:
         gc.collect()  # TODO: Actually figure out where the memory leak is.
         _step(simulation)
+        steps += 1
+        if checkpoint_path and checkpoint_interval and steps % checkpoint_interval == 0:
+            from vivarium.framework.checkpoint import save_checkpoint
+            save_checkpoint(simulation, checkpoint_path)
+
+
+@creates_simulants
+def _run_prefix(simulation, stop, simulant_creator):
+    simulation.metrics.start_run()
+    _initialize_population(simulation, simulant_creator)
+    _run_until(simulation, stop)
+
 
+@emits('simulation_end')
+def _end_simulation(simulation, end_emitter):
     end_emitter(Event(simulation.population.population.index))
 
 
-def setup_simulation(component_manager):
+def setup_simulation(component_manager, shard=None):
     component_manager.add_components([_step, event_loop])
-    simulation = SimulationContext(component_manager)
+    simulation = SimulationContext(component_manager, shard)
 
     simulation.setup()
 
     return simulation
 
 
-def run_simulation(simulation):
+def run_simulation(simulation, **checkpoint_options):
+    """Run a simulation which has been set up and collect its metrics.
+
+    Any keyword arguments are checkpointing options for `event_loop`.
+    """
     start = time()
 
-    event_loop(simulation)
+    event_loop(simulation, **checkpoint_options)
+
+    return _collect_metrics(simulation, start)
+
 
+def _collect_metrics(simulation, start):
     metrics = simulation.values.get_value('metrics')
     metrics.source = lambda index: {}
     metrics = metrics(simulation.population.population.index)
@@ -146,6 +217,202 @@ def run_simulation(simulation):
     return metrics
 
 
+# State shared with shard workers, inherited when they are forked.
+_shard_state = None
+
+
+def _use_own_metrics_path(suffix, source):
+    """Stream this run's observations to a file of its own, so that runs happening at the same time
+    don't write to the same one."""
+    if 'metrics' in config and 'path' in config.metrics and config.metrics.path:
+        config.read_dict({'metrics': {'path': '{}.{}'.format(config.metrics.path, suffix)}},
+                         layer='override', source=source)
+
+
+def _use_run_metrics_path(source):
+    """Stream this run's observations to a file of its own, named for its branch and draws."""
+    from vivarium.framework.results import branch_key, run_branch
+
+    run_configuration = config.run_configuration
+    _use_own_metrics_path('branch_{}_draw_{}_{}'.format(branch_key(run_branch(run_configuration.run_key.to_dict())),
+                                                       run_configuration.draw_number,
+                                                       run_configuration.model_draw_number),
+                          source)
+
+
+def _run_shard(shard):
+    component_manager, shards = _shard_state
+    _use_own_metrics_path('shard_{}'.format(shard), 'shard')
+    simulation = setup_simulation(component_manager, shard=(shard, shards))
+    return run_simulation(simulation)
+
+
+def merge_metrics(shard_metrics):
+    """Combine the metrics produced by each shard of a simulation.
+
+    Numeric metrics are summed, except for ``simulation_run_time`` which is the longest of the
+    shards' run times.  Any other metric is taken from the first shard that reports it.
+    """
+    merged = {}
+    for metrics in shard_metrics:
+        for name, value in metrics.items():
+            if name not in merged:
+                merged[name] = value
+            elif name == 'simulation_run_time':
+                merged[name] = max(merged[name], value)
+            elif isinstance(value, numbers.Number) and not isinstance(value, bool):
+                merged[name] += value
+    return merged
+
+
+def run_sharded(component_manager, shards):
+    """Run a single simulation with its population split across several processes.
+
+    Each of the ``shards`` worker processes is forked from this one with the loaded components,
+    sets them up with a population that holds only the simulants whose id is congruent to the
+    shard number modulo ``shards`` and runs the whole simulation for them.  Because common random
+    numbers are keyed on simulant id, each simulant has the same history it would have had in an
+    unsharded run and the merged metrics (see `merge_metrics`) match the unsharded ones.
+
+    Notes
+    -----
+    This only holds for models in which simulants do not influence one another. Components whose
+    behavior depends on the size or structure of the population, fertility models for example,
+    see only their own shard and so will diverge from the unsharded simulation.  Metrics must
+    also be totals which can be summed across shards rather than means or proportions.
+
+    Returns
+    -------
+    dict
+        The merged metrics.
+    """
+    import multiprocessing
+
+    global _shard_state
+    _shard_state = (component_manager, shards)
+    try:
+        with multiprocessing.get_context('fork').Pool(shards) as pool:
+            shard_metrics = pool.map(_run_shard, range(shards))
+    finally:
+        _shard_state = None
+    return merge_metrics(shard_metrics)
+
+
+# State shared with branch workers, inherited when they are forked.
+_fork_state = None
+
+
+def _continue_branch(branch_config):
+    simulation, component_config, checkpoint_path = _fork_state
+    configure(simulation_config=branch_config)
+    config.read_dict({'run_configuration': {'run_key': branch_config}}, layer='model_override',
+                     source='branch')
+    if checkpoint_path:
+        from vivarium.framework.checkpoint import load_checkpoint
+
+        simulation = setup_simulation(load_component_manager(deepcopy(component_config)))
+        load_checkpoint(simulation, checkpoint_path)
+
+    _start_run()
+    _use_run_metrics_path('branch')
+    simulation.metrics.start_run()
+    start = time()
+    _run_until(simulation, _get_time('end'))
+    _end_simulation(simulation)
+    return _finish_run(_collect_metrics(simulation, start))
+
+
+def _check_branches_unread(branches):
+    """Raise if any branch overrides configuration which has already been read, as it would be ignored."""
+    unused = config.unused_keys()
+    read = set()
+    # Every branch expanded from a template overrides the same keys.
+    for template in branches:
+        for key, _ in collapse_nested_dict(template):
+            try:
+                config.metadata(key)
+            except KeyError:
+                continue
+            if key not in unused:
+                read.add(key)
+    if read:
+        raise VivariumError('Branches override {}, which had already been read when the simulation was set up so a '
+                            'fork would ignore the overrides. Pass a checkpoint path to set up each branch '
+                            'separately.'.format(sorted(read)))
+
+
+def _run_branch(branch_config):
+    # Each branch continues from a fresh copy of the worker, which is untouched since it was forked.
+    return run_in_fork(_continue_branch, branch_config)
+
+
+def run_from_fork(component_config, branches, fork_time, checkpoint_path=None, workers=None):
+    """Run the part of a simulation shared by several branches once and each branch from there.
+
+    The simulation is run with the current configuration up to ``fork_time`` and then each
+    branch continues from that point with its configuration overrides applied.
+
+    By default each branch continues the simulation in a forked copy of this process, so only
+    configuration which is read as the simulation runs sees the branch's overrides, and a
+    `VivariumError` is raised if a branch overrides configuration that has already been read by
+    the time the simulation is set up, as it would be ignored.  If ``checkpoint_path`` is given
+    the state at ``fork_time`` is saved there instead and each branch sets up a fresh simulation
+    with its overrides applied before restoring that state, so configuration read during setup
+    is overridden as well.  This requires the branches to use the same components and every
+    component to save any state it keeps outside the population table, see
+    `vivarium.framework.checkpoint`.
+
+    Parameters
+    ----------
+    component_config : dict
+        Parsed component configuration shared by every branch.
+    branches : list of dict
+        Branch templates as accepted by `vivarium.framework.util.expand_branch_templates`.
+    fork_time : pandas.Timestamp
+        Simulation time at which the branches diverge.
+    checkpoint_path : str
+        Where to save the state at the fork time if branches should be set up separately.
+    workers : int
+        Number of branches to run at once. Defaults to the number of CPUs.
+
+    Returns
+    -------
+    list of dict
+        The metrics for each branch.
+
+    Raises
+    ------
+    VivariumError
+        If there is no ``checkpoint_path`` and a branch overrides configuration which has been
+        read by the time the simulation is set up.
+    """
+    import multiprocessing
+    from vivarium.framework.checkpoint import save_checkpoint
+
+    global _fork_state
+    simulation = setup_simulation(load_component_manager(deepcopy(component_config)))
+    if not checkpoint_path:
+        _check_branches_unread(branches)
+    _run_prefix(simulation, pd.Timestamp(fork_time))
+    # Observations up to the fork belong in the prefix's file rather than each branch's
+    simulation.metrics.sink.flush()
+    if checkpoint_path:
+        save_checkpoint(simulation, checkpoint_path)
+        simulation = None
+
+    _fork_state = (simulation, component_config, checkpoint_path)
+    try:
+        with multiprocessing.get_context('fork').Pool(workers) as pool:
+            return pool.map(_run_branch, list(iter_branch_templates(branches)), chunksize=1)
+    finally:
+        _fork_state = None
+
+
+def _is_set(name):
+    # A simulation set up before its draws are configured reads them anyway, leaving empty trees behind
+    return name in config.run_configuration and not isinstance(config.run_configuration[name], ConfigTree)
+
+
 def configure(input_draw_number=None, model_draw_number=None, simulation_config=None):
     if simulation_config:
         if isinstance(simulation_config, dict):
@@ -157,7 +424,7 @@ def configure(input_draw_number=None, model_draw_number=None, simulation_config=
         config.run_configuration.set_with_metadata('draw_number', input_draw_number,
                                                    layer='override', source='command_line_argument')
     else:
-        if 'draw_number' not in config.run_configuration:
+        if not _is_set('draw_number'):
             config.run_configuration.set_with_metadata('draw_number', 0,
                                                        layer='override', source='default')
 
@@ -165,16 +432,45 @@ def configure(input_draw_number=None, model_draw_number=None, simulation_config=
         config.run_configuration.set_with_metadata('model_draw_number', model_draw_number,
                                                    layer='override', source='command_line_argument')
     else:
-        if 'model_draw_number' not in config.run_configuration:
+        if not _is_set('model_draw_number'):
             config.run_configuration.set_with_metadata('model_draw_number', 0,
                                                        layer='override', source='default')
 
 
-def run(component_manager):
+def _start_run():
     config.set_with_metadata('run_configuration.run_id', str(time()), layer='base')
     config.set_with_metadata('run_configuration.run_key', {'draw': config.run_configuration.draw_number}, layer='base')
-    simulation = setup_simulation(component_manager)
-    metrics = run_simulation(simulation)
+
+
+def run(component_manager, shards=1, **checkpoint_options):
+    _start_run()
+    if shards > 1:
+        if checkpoint_options:
+            raise VivariumError('Checkpointing is not supported for sharded runs')
+        metrics = run_sharded(component_manager, shards)
+    else:
+        simulation = setup_simulation(component_manager)
+        metrics = run_simulation(simulation, **checkpoint_options)
+    return _finish_run(metrics)
+
+
+def run_prepared(simulation, model_draw_number):
+    """Run a simulation which has already been set up with `setup_simulation`.
+
+    Setup depends on the input draw but not on the model draw, so one prepared simulation can
+    be run for any number of model draws.  Running consumes the simulation, so this is usually
+    called through `vivarium.framework.util.run_in_fork` which leaves the prepared simulation
+    untouched for the next draw.  Since those runs may happen at once, each streams its metrics
+    to a file of its own named for its branch and draws.
+    """
+    configure(model_draw_number=model_draw_number)
+    simulation.set_model_draw(model_draw_number)
+    _start_run()
+    _use_run_metrics_path('prepared')
+    return _finish_run(run_simulation(simulation))
+
+
+def _finish_run(metrics):
     for name, value in collapse_nested_dict(config.run_configuration.run_key.to_dict()):
         metrics[name] = value
 
@@ -187,19 +483,126 @@ def run(component_manager):
     return metrics
 
 
+# State shared with batch workers. It is set in the parent before the pool starts so that forked
+# workers inherit it, along with every module the parent has already imported, instead of
+# receiving it through pickling.
+_batch_state = None
+
+
+def _run_batch_job(job):
+    branch_number, input_draw_number, model_draw_number = job
+    component_config, branches, base_config = _batch_state
+    # Workers are reused between jobs so put the global configuration back the way it was in the parent.
+    config.rebase(base_config)
+
+    branch_config = get_branch(branches, branch_number)
+    component_config = deepcopy(component_config)
+    component_config.setdefault('configuration', {})
+    run_configuration = component_config['configuration'].get('run_configuration', {})
+    run_configuration['run_id'] = '{}_{}'.format(os.getpid(), time())
+    run_configuration['run_key'] = dict(branch_config)
+    run_configuration['run_key']['input_draw'] = input_draw_number
+    run_configuration['run_key']['model_draw'] = model_draw_number
+    component_config['configuration']['run_configuration'] = run_configuration
+
+    configure(input_draw_number=input_draw_number, model_draw_number=model_draw_number,
+              simulation_config=branch_config)
+    component_manager = load_component_manager(component_config)
+    _use_run_metrics_path('batch')
+    return job, run(component_manager)
+
+
+def run_batch(component_config, branches, input_draws, model_draw_number=0, workers=None, results_path=None):
+    """Run every branch for every input draw in a local pool of worker processes.
+
+    Parameters
+    ----------
+    component_config : dict
+        Parsed component configuration shared by every run.
+    branches : list of dict
+        Branch templates as accepted by `vivarium.framework.util.expand_branch_templates`.
+    input_draws : iterable of int
+        Input draws to run for each branch.
+    model_draw_number : int
+        Model draw used for every run.
+    workers : int
+        Number of worker processes. Defaults to the number of CPUs.
+    results_path : str
+        If supplied, each run's metrics are written to this HDF file as soon as the run finishes
+        under the key ``runs/branch_<branch>_draw_<draw>``, and all of them are written under
+        ``data`` once the batch is complete.
+
+    Returns
+    -------
+    pandas.DataFrame
+        The metrics for every run, one row per run ordered by branch and then draw.
+    """
+    import multiprocessing
+
+    global _batch_state
+    jobs = [(branch_number, input_draw, model_draw_number) for branch_number in range(branch_count(branches))
+            for input_draw in input_draws]
+    if results_path:
+        os.makedirs(os.path.dirname(os.path.abspath(results_path)), exist_ok=True)
+
+    _batch_state = (component_config, branches, config.frozen_copy())
+    results = {}
+    try:
+        with multiprocessing.get_context('fork').Pool(workers) as pool:
+            for job, metrics in pool.imap_unordered(_run_batch_job, jobs):
+                branch_number, input_draw, _ = job
+                _log.debug('Finished branch %s draw %s', branch_number, input_draw)
+                results[job] = metrics
+                if results_path:
+                    pd.DataFrame([metrics]).to_hdf(results_path,
+                                                   'runs/branch_{}_draw_{}'.format(branch_number, input_draw))
+    finally:
+        _batch_state = None
+
+    results = pd.DataFrame([results[job] for job in jobs])
+    if results_path:
+        results.to_hdf(results_path, 'data')
+    return results
+
+
 def do_command(args):
+    from vivarium.framework.results import append_results, branch_key, compact_dataset, run_branch
+
+    if args.command == 'compact':
+        if not args.results_dataset:
+            raise VivariumError('compact requires the path of a results dataset (--results_dataset)')
+        merged = compact_dataset(args.results_dataset)
+        _log.info('Merged %s files in %s', merged, args.results_dataset)
+        return
+
     configure(input_draw_number=args.input_draw, simulation_config=args.config)
 
     if args.components.endswith('.yaml'):
         with open(args.components) as f:
             component_config = f.read()
-        component_config = yaml.load(component_config)
+        component_config = load_yaml(component_config)
     else:
         raise VivariumError("Unknown components configuration type: {}".format(args.components))
 
+    if args.command in ['run-batch', 'fork']:
+        if not args.branches:
+            raise VivariumError('{} requires a branch configuration file (--branches)'.format(args.command))
+        with open(args.branches) as f:
+            branches = load_yaml(f.read())
+        if isinstance(branches, dict):
+            branches = branches['branches']
+
     component_manager = load_component_manager(component_config=component_config)
     if args.command == 'run':
-        results = run(component_manager)
+        checkpoint_options = {}
+        if args.checkpoint:
+            checkpoint_options = {'checkpoint_path': args.checkpoint,
+                                  'checkpoint_interval': args.checkpoint_interval, 'resume': args.resume}
+        elif args.resume:
+            raise VivariumError('--resume requires a checkpoint path (--checkpoint)')
+        if args.metrics_path:
+            config.read_dict({'metrics': {'path': args.metrics_path}}, layer='override', source='command_line_argument')
+        results = run(component_manager, shards=args.shards, **checkpoint_options)
         if args.results_path:
             try:
                 os.makedirs(os.path.dirname(args.results_path))
@@ -207,7 +610,26 @@ def do_command(args):
                 # Directory already exists, which is fine
                 pass
             pd.DataFrame([results]).to_hdf(args.results_path, 'data')
+        if args.results_dataset:
+            run_configuration = config.run_configuration
+            branch = run_branch(run_configuration.run_key.to_dict())
+            index = pd.MultiIndex.from_tuples([(run_configuration.draw_number, run_configuration.model_draw_number)],
+                                              names=['input_draw_number', 'model_draw_number'])
+            append_results(args.results_dataset, pd.DataFrame([results], index=index),
+                           branch=branch_key(branch), input_draw=run_configuration.draw_number)
+    elif args.command == 'run-batch':
+        run_batch(component_config, branches, range(*args.draw_range), model_draw_number=args.model_draw,
+                  workers=args.workers, results_path=args.results_path)
+    elif args.command == 'fork':
+        if not args.fork_time:
+            raise VivariumError('fork requires the time at which branches diverge (--fork_time)')
+        results = pd.DataFrame(run_from_fork(component_config, branches, args.fork_time,
+                                             checkpoint_path=args.checkpoint, workers=args.workers))
+        if args.results_path:
+            os.makedirs(os.path.dirname(os.path.abspath(args.results_path)), exist_ok=True)
+            results.to_hdf(args.results_path, 'data')
     elif args.command == 'list_datasets':
+        import yaml
         component_manager.load_components_from_config()
         pprint(yaml.dump(list(component_manager.dataset_manager.datasets_loaded)))
 
@@ -215,7 +637,7 @@ def do_command(args):
 
 def main():
     parser = argparse.ArgumentParser()
-    parser.add_argument('command', choices=['run', 'list_datasets'])
+    parser.add_argument('command', choices=['run', 'run-batch', 'fork', 'compact', 'list_datasets'])
     parser.add_argument('components', nargs='?', default=None, type=str)
     parser.add_argument('--verbose', '-v', action='store_true')
     parser.add_argument('--config', '-c', type=str, default=None,
@@ -223,9 +645,31 @@ def main():
     parser.add_argument('--input_draw', '-d', type=int, default=0, help='Which GBD draw to use')
     parser.add_argument('--model_draw', type=int, default=0, help="Which draw from the model's own variation to use")
     parser.add_argument('--results_path', '-o', type=str, default=None, help='Path to write results to')
+    parser.add_argument('--results_dataset', type=str, default=None,
+                        help='Path of a partitioned results dataset to append the results of run to, or to compact')
     parser.add_argument('--process_number', '-n', type=int, default=1, help='Instance number for this process')
+    parser.add_argument('--shards', type=int, default=1,
+                        help='Number of processes to split the population of a single run across')
+    parser.add_argument('--checkpoint', type=str, default=None,
+                        help='Path to save checkpoints of the simulation to')
+    parser.add_argument('--checkpoint_interval', type=int, default=12,
+                        help='Number of time steps between checkpoints')
+    parser.add_argument('--resume', action='store_true',
+                        help='Resume from the checkpoint if there is one rather than starting over')
+    parser.add_argument('--metrics_path', type=str, default=None,
+                        help='Path to an HDF file to stream time resolved metrics to')
+    parser.add_argument('--branches', '-b', type=str, default=None,
+                        help='Path to a yaml file of branch templates to run with run-batch')
+    parser.add_argument('--draw_range', type=int, nargs=2, default=[0, 1], metavar=('START', 'STOP'),
+                        help='Range of input draws to run with run-batch')
+    parser.add_argument('--workers', '-w', type=int, default=None,
+                        help='Number of worker processes to use with run-batch and fork. Defaults to the number of CPUs')
+    parser.add_argument('--fork_time', type=str, default=None,
+                        help='Simulation time at which the branches diverge when running fork')
     parser.add_argument('--log', type=str, default=None, help='Path to log file')
     parser.add_argument('--pdb', action='store_true', help='Run in the debugger')
+    parser.add_argument('--import-profile', action='store_true',
+                        help='Report the time spent importing modules during start up')
     args = parser.parse_args()
 
     log_level = logging.DEBUG if args.verbose else logging.ERROR
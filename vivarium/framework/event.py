@@ -3,7 +3,7 @@
 
 from collections import defaultdict
 
-from .util import marker_factory, resource_injector
+from .util import marker_factory, resource_injector, marked_attributes
 
 listens_for = marker_factory('event_system__listens_for', with_priority=True)
 listens_for.__doc__ = """Mark a function as a listener for the named event so that
@@ -145,21 +145,19 @@ class EventManager:
         """
         emits.set_injector(self._emitter_injector)
         for component in components:
-            listeners = [(v, component, i)
-                         for i, priority in enumerate(listens_for.finder(component))
-                         for v in priority]
-            listeners += [(v, getattr(component, att), i)
-                          for att in sorted(dir(component))
-                          for i, vs in enumerate(listens_for.finder(getattr(component, att)))
-                          for v in vs]
+            members = [component] + [member for _, member in marked_attributes(component)]
+
+            listeners = [(v, member, i)
+                         for member in members
+                         for i, vs in enumerate(listens_for.finder(member))
+                         for v in vs]
 
             for event, listener, priority in listeners:
                 self.register_listener(event, listener, priority)
 
-            emitters = [(v, component) for v in emits.finder(component)]
-            emitters += [(v, getattr(component, att))
-                         for att in sorted(dir(component))
-                         for v in emits.finder(getattr(component, att))]
+            emitters = [(v, member)
+                        for member in members
+                        for v in emits.finder(member)]
 
             # Pre-create the EventChannels for known emitters
             for (args, kwargs), emitter in emitters:
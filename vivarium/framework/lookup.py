@@ -1,7 +1,12 @@
 """A set of tools for managing data lookups."""
+import json
+import os
+import shutil
+import tempfile
 from numbers import Number
 from datetime import datetime, timedelta
 
+import numpy as np
 import pandas as pd
 
 from vivarium.interpolation import Interpolation
@@ -60,6 +65,177 @@ class ScalarView(TableView):
         return "ScalarView(value={})".format(self.value)
 
 
+def _json_key(key):
+    """Convert a group key from pandas into something json can store."""
+    if isinstance(key, tuple):
+        return [_json_key(k) for k in key]
+    return key.item() if isinstance(key, np.generic) else key
+
+
+def publish_table(data, path, key_columns=('sex',), parameter_columns=('age', 'year')):
+    """Write the arrays behind a linear interpolation of ``data`` to the directory ``path``.
+
+    The table is written once per path. Any number of processes can then `attach_table` to it,
+    memory mapping the arrays rather than each one rebuilding its own interpolations from the
+    source data. Putting ``path`` on a tmpfs such as ``/dev/shm`` keeps the table in shared memory.
+    Publishing is atomic so concurrent publishers are safe and all but the first are no-ops.
+
+    Parameters
+    ----------
+    data : pandas.DataFrame
+        The source data, as would be passed to ``build_table``.
+    path : str
+        Directory to publish the table to.
+    key_columns : [str]
+        Columns used to select between interpolation functions.
+    parameter_columns : [str]
+        One or two columns which are the parameters to the interpolation. With two the data must
+        cover a complete grid of their values.
+
+    Returns
+    -------
+    str
+        The path the table was published to.
+    """
+    if os.path.exists(os.path.join(path, 'metadata.json')):
+        return path
+    key_columns, parameter_columns = list(key_columns), list(parameter_columns)
+    if len(parameter_columns) not in [1, 2]:
+        raise ValueError("Only interpolation over 1 or 2 variables is supported")
+    value_columns = sorted(data.columns.difference(set(key_columns) | set(parameter_columns)))
+
+    parent = os.path.dirname(os.path.abspath(path))
+    os.makedirs(parent, exist_ok=True)
+    staging = tempfile.mkdtemp(prefix='.publish-', dir=parent)
+    try:
+        groups = []
+        sub_tables = data.groupby(key_columns) if key_columns else [(None, data)]
+        for number, (key, base_table) in enumerate(sub_tables):
+            if base_table.empty:
+                continue
+            if len(parameter_columns) == 2:
+                index, column = parameter_columns
+                tables = [base_table.pivot(index=index, columns=column, values=value_column)
+                          for value_column in value_columns]
+                axes = [tables[0].index.values, tables[0].columns.values]
+                values = np.stack([table.values for table in tables])
+            else:
+                base_table = base_table.sort_values(by=parameter_columns[0])
+                axes = [base_table[parameter_columns[0]].values]
+                values = base_table[value_columns].values.T
+            if any(len(axis) < 2 for axis in axes):
+                raise ValueError('Linear interpolation needs at least two points along each parameter')
+
+            name = 'group_{}'.format(number)
+            for i, axis in enumerate(axes):
+                np.save(os.path.join(staging, '{}_axis_{}.npy'.format(name, i)), axis.astype(np.float64))
+            np.save(os.path.join(staging, '{}_values.npy'.format(name)), values.astype(np.float64))
+            groups.append({'name': name, 'key': _json_key(key)})
+
+        with open(os.path.join(staging, 'metadata.json'), 'w') as f:
+            json.dump({'key_columns': key_columns, 'parameter_columns': parameter_columns,
+                       'value_columns': value_columns, 'groups': groups}, f)
+        try:
+            os.rename(staging, path)
+        except OSError:
+            # Someone else published the table first.
+            if not os.path.exists(os.path.join(path, 'metadata.json')):
+                raise
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+    return path
+
+
+def attach_table(path, func=None):
+    """Attach to a table written by `publish_table`.
+
+    Returns
+    -------
+    SharedInterpolation
+        Suitable for passing to ``build_table`` in place of the source data.
+    """
+    return SharedInterpolation(path, func)
+
+
+def _linear_weights(axis, points):
+    """Find the interval of ``axis`` each point falls in and how far along it the point is."""
+    i = np.clip(np.searchsorted(axis, points, side='right') - 1, 0, len(axis) - 2)
+    return i, (points - axis[i]) / (axis[i+1] - axis[i])
+
+
+class SharedInterpolation:
+    """A linear interpolation over memory mapped arrays published by `publish_table`.
+
+    This gives the same results as the order 1 `vivarium.interpolation.Interpolation` of the
+    source data. With one parameter values beyond the data are extrapolated linearly, with two
+    the parameters are clamped to the edges of the grid.
+
+    Notes
+    -----
+    Use `attach_table` to create these.
+    """
+
+    def __init__(self, path, func=None):
+        with open(os.path.join(path, 'metadata.json')) as f:
+            metadata = json.load(f)
+        self.key_columns = metadata['key_columns']
+        self.parameter_columns = metadata['parameter_columns']
+        self.value_columns = metadata['value_columns']
+        self.func = func
+
+        self.interpolations = {}
+        for group in metadata['groups']:
+            key = tuple(group['key']) if len(self.key_columns) > 1 else group['key']
+            axes = [np.load(os.path.join(path, '{}_axis_{}.npy'.format(group['name'], i)), mmap_mode='r')
+                    for i in range(len(self.parameter_columns))]
+            values = np.load(os.path.join(path, '{}_values.npy'.format(group['name'])), mmap_mode='r')
+            self.interpolations[key] = (axes, values)
+
+    def _evaluate(self, axes, values, parameters):
+        if len(axes) == 1:
+            i, t = _linear_weights(axes[0], parameters[0])
+            return values[:, i] + t*(values[:, i+1] - values[:, i])
+
+        x, y = [np.clip(p, axis[0], axis[-1]) for p, axis in zip(parameters, axes)]
+        i, t = _linear_weights(axes[0], x)
+        j, u = _linear_weights(axes[1], y)
+        return (values[:, i, j]*(1-t)*(1-u) + values[:, i+1, j]*t*(1-u)
+                + values[:, i, j+1]*(1-t)*u + values[:, i+1, j+1]*t*u)
+
+    def __call__(self, *args, **kwargs):
+        if len(args) == 1:
+            df = args[0]
+        else:
+            df = pd.DataFrame(kwargs)
+
+        if self.key_columns:
+            sub_tables = df.groupby(self.key_columns)
+        else:
+            sub_tables = [(None, df)]
+
+        result = pd.DataFrame(index=df.index)
+        for key, sub_table in sub_tables:
+            if sub_table.empty:
+                continue
+            axes, values = self.interpolations[key]
+            parameters = [sub_table[k].values.astype(np.float64) for k in self.parameter_columns]
+            with np.errstate(under='ignore'):
+                out = self._evaluate(axes, values, parameters)
+            for value_column, column_out in zip(self.value_columns, out):
+                result.loc[sub_table.index, value_column] = column_out
+
+        if self.func:
+            return self.func(result)
+
+        if len(result.columns) == 1:
+            return result[result.columns[0]]
+
+        return result
+
+    def __repr__(self):
+        return "SharedInterpolation()"
+
+
 class InterpolatedDataManager:
     """Container for interpolation functions over input data. Interpolation can
     be turned off on a case by case basis in which case the data will be
@@ -100,6 +276,9 @@ class InterpolatedDataManager:
         interpolation_order : int
                       The order of the interpolation function. Defaults to linear.
 
+        ``data`` may also be a table attached with `attach_table`, in which case its own key and
+        parameter columns are used.
+
         Returns
         -------
         TableView
@@ -109,8 +288,10 @@ class InterpolatedDataManager:
         if isinstance(data, Number) or isinstance(data, datetime) or isinstance(data, timedelta):
             return ScalarView(data)
 
-        data = data if isinstance(data, Interpolation) else Interpolation(data, key_columns, parameter_columns,
-                                                                          order=interpolation_order)
+        if isinstance(data, SharedInterpolation):
+            key_columns, parameter_columns = data.key_columns, data.parameter_columns
+        elif not isinstance(data, Interpolation):
+            data = Interpolation(data, key_columns, parameter_columns, order=interpolation_order)
 
         view_columns = sorted((set(key_columns) | set(parameter_columns)) - {'year'})
         return InterpolatedTableView(data, self._pop_view_builder(view_columns),
@@ -0,0 +1,240 @@
+"""Streaming collection of time resolved metrics.
+
+Rather than accumulating per step results in their own memory until the end of the run, components can
+record observations into tables in the simulation's `MetricsSink`, which they get from
+``builder.metrics_sink()`` during setup::
+
+    class DeathCounter:
+        def setup(self, builder):
+            self.metrics = builder.metrics_sink()
+
+        @listens_for('collect_metrics')
+        @uses_columns(['alive'])
+        def count_deaths(self, event):
+            self.metrics.record('deaths', {'deaths': (event.population.alive == 'dead').sum()})
+
+Observations are buffered and appended in batches to the HDF file named by the ``metrics.path``
+configuration value. Without a path they are kept in memory, up to ``metrics.max_memory_rows`` rows,
+so long runs need a path. String values may be at most ``metrics.string_size`` characters long.
+
+Each run starts its file afresh and stamps its observations with ``input_draw``, ``model_draw`` and
+``branch`` columns, as in `vivarium.framework.results`. Runs which may happen at the same time, the
+jobs of a batch or the branches of a fork, each write to their own file named by suffixing the
+configured path.
+"""
+import os
+from collections import OrderedDict
+
+import pandas as pd
+
+from vivarium import config, VivariumError
+
+from .event import listens_for
+
+
+class MetricsError(VivariumError):
+    """Raised when observations don't match the table they are recorded in."""
+    pass
+
+
+class MetricsSink:
+    """Buffers observations and writes them in batches to tables in an HDF file.
+
+    Each table's columns and their types are fixed by the first observations recorded in it.
+    Buffered observations are written once more than ``buffer_size`` rows are waiting at the end
+    of a time step, so the memory used is bounded by ``buffer_size`` plus a single step's
+    observations.
+
+    Parameters
+    ----------
+    path : str
+        HDF file to write to. If None observations are kept in memory.
+    buffer_size : int
+        Number of rows to buffer before writing.
+    clock : callable
+        If given, each observation is stamped with the current time in a ``time`` column.
+    run : dict
+        If given, each observation is stamped with these column names and values identifying the run.
+    string_size : int
+        Maximum length of string values. The HDF tables reserve this much space for every string.
+    max_memory_rows : int
+        Maximum number of rows to keep in memory when there is no path.
+    """
+
+    def __init__(self, path=None, buffer_size=10000, clock=None, string_size=64, max_memory_rows=1000000,
+                 run=None):
+        self.path = path
+        self.buffer_size = buffer_size
+        self.clock = clock
+        self.run = run
+        self.string_size = string_size
+        self.max_memory_rows = max_memory_rows
+        self._schemas = {}
+        self._buffers = {}
+        self._buffered_rows = 0
+        self._written = {}
+        self._written_rows = 0
+
+    def record(self, table, observations):
+        """Record observations in the named table.
+
+        Parameters
+        ----------
+        table : str
+        observations : pandas.DataFrame or dict
+            Either a frame with a row per observation or a mapping of column names to a single
+            observation's values.
+
+        Raises
+        ------
+        MetricsError
+            If the columns or their types differ from those already recorded in the table or a
+            string is longer than ``string_size``.
+        """
+        if not isinstance(observations, pd.DataFrame):
+            observations = pd.DataFrame({k: [v] for k, v in observations.items()}, columns=list(observations))
+        else:
+            observations = observations.reset_index(drop=True)
+        for i, (name, value) in enumerate((self.run or {}).items()):
+            observations.insert(i, name, value)
+        if self.clock:
+            observations.insert(0, 'time', self.clock())
+
+        if table in self._schemas and list(observations.columns) != [c for c, _ in self._schemas[table]]:
+            # Put the columns in the table's order, or catch the mismatch below if they differ
+            columns = [c for c, _ in self._schemas[table]]
+            if set(columns) == set(observations.columns):
+                observations = observations[columns]
+        schema = list(zip(observations.columns, observations.dtypes))
+        if table not in self._schemas:
+            self._schemas[table] = schema
+            self._buffers[table] = []
+        elif schema != self._schemas[table]:
+            raise MetricsError('Observations for {} have columns {} but the table has {}'.format(
+                table, schema, self._schemas[table]))
+        for column in observations.columns[observations.dtypes == object]:
+            longest = observations[column].astype(str).str.len().max()
+            if longest > self.string_size:
+                raise MetricsError('{} in {} has values of up to {} characters but metrics.string_size is {}'.format(
+                    column, table, longest, self.string_size))
+
+        self._buffers[table].append(observations)
+        self._buffered_rows += len(observations)
+
+    def end_step(self):
+        """Write the buffered observations if the buffer is full."""
+        if self._buffered_rows >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        """Write all buffered observations.
+
+        Raises
+        ------
+        MetricsError
+            If there is no path and more than ``max_memory_rows`` rows would be kept in memory.
+        """
+        if not self.path and self._written_rows + self._buffered_rows > self.max_memory_rows:
+            raise MetricsError('More than {} rows of metrics recorded without a metrics.path to write them to'.format(
+                self.max_memory_rows))
+        for table, frames in self._buffers.items():
+            if not frames:
+                continue
+            data = pd.concat(frames, ignore_index=True)
+            if self.path:
+                min_itemsize = {c: self.string_size for c in data.columns if data[c].dtype == object}
+                data.to_hdf(self.path, table, format='table', append=True, min_itemsize=min_itemsize or None)
+            else:
+                self._written.setdefault(table, []).append(data)
+                self._written_rows += len(data)
+            self._buffers[table] = []
+        self._buffered_rows = 0
+
+    def read(self, table):
+        """Read everything recorded in a table, including observations still buffered."""
+        frames = []
+        if self.path and table in self._schemas:
+            try:
+                frames.append(pd.read_hdf(self.path, table))
+            except (KeyError, FileNotFoundError):
+                # Nothing written yet
+                pass
+        frames.extend(self._written.get(table, []))
+        frames.extend(self._buffers.get(table, []))
+        if not frames:
+            raise KeyError(table)
+        return pd.concat(frames, ignore_index=True)
+
+    @property
+    def tables(self):
+        return list(self._schemas)
+
+    def __repr__(self):
+        return 'MetricsSink(path={}, buffer_size={})'.format(self.path, self.buffer_size)
+
+
+class MetricsManager:
+    """Owns the simulation's `MetricsSink` and writes it out at the end of each time step.
+
+    Notes
+    -----
+    Client code should never access this class directly. Use ``metrics_sink`` on the builder during
+    setup to get the sink.
+    """
+
+    configuration_defaults = {
+        'metrics': {
+            'path': None,
+            'buffer_size': 10000,
+            'string_size': 64,
+            'max_memory_rows': 1000000,
+        }
+    }
+
+    def __init__(self):
+        self.sink = MetricsSink()
+
+    def setup(self, builder):
+        self.sink.path = config.metrics.path
+        self.sink.buffer_size = config.metrics.buffer_size
+        self.sink.string_size = config.metrics.string_size
+        self.sink.max_memory_rows = config.metrics.max_memory_rows
+        self.sink.clock = builder.clock()
+
+    def start_run(self, resume=False):
+        """Start recording a run's observations.
+
+        They are written to the file named by ``metrics.path`` when the run starts, so that each job
+        can be given its own, and stamped with the run's draws and branch.
+
+        Parameters
+        ----------
+        resume : bool
+            Whether the run is continuing from a checkpoint. Otherwise any existing file is replaced
+            rather than added to. A resumed run adds to its file, so observations written after the
+            checkpoint was saved, before the run stopped, appear twice.
+        """
+        from vivarium.framework.results import branch_key, run_branch
+
+        self.sink.path = config.metrics.path
+        if self.sink.path and not resume and os.path.exists(self.sink.path):
+            os.remove(self.sink.path)
+
+        run_configuration = config.run_configuration
+        run_key = run_configuration.run_key.to_dict() if 'run_key' in run_configuration else {}
+        self.sink.run = OrderedDict([
+            ('input_draw', run_configuration.draw_number if 'draw_number' in run_configuration else 0),
+            ('model_draw', run_configuration.model_draw_number if 'model_draw_number' in run_configuration else 0),
+            ('branch', branch_key(run_branch(run_key))),
+        ])
+
+    @listens_for('collect_metrics', priority=9)
+    def end_step(self, event):
+        self.sink.end_step()
+
+    @listens_for('simulation_end', priority=9)
+    def flush(self, event):
+        self.sink.flush()
+
+    def __repr__(self):
+        return 'MetricsManager()'
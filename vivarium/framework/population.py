@@ -2,6 +2,7 @@
 """
 from collections import defaultdict
 
+import numpy as np
 import pandas as pd
 
 from vivarium import VivariumError
@@ -139,6 +140,12 @@ class PopulationView:
             if not self.manager.growing:
                 affected_columns = set(affected_columns).intersection(self.manager._population.columns)
 
+            if self.manager.shard is None:
+                # Simulant ids are the row positions in an unsharded population table.
+                positions = pop.index
+            else:
+                positions = self.manager._population.index.get_indexer(pop.index)
+
             for c in affected_columns:
                 if c in self.manager._population:
                     v = self.manager._population[c].values
@@ -146,7 +153,7 @@ class PopulationView:
                         v2 = pop.values
                     else:
                         v2 = pop[c].values
-                    v[pop.index] = v2
+                    v[positions] = v2
 
                     if v.dtype != v2.dtype:
                         # This happens when the population is being grown because extending
@@ -212,11 +219,18 @@ class PopulationManager:
         Client code should never need to interact with this class
         except through the ``population_view`` function on the builder
         during setup.
+
+        When ``shard`` is given as ``(i, K)`` the manager only holds the simulants whose id
+        is congruent to ``i`` modulo ``K``.  Ids are still assigned as if the whole population
+        were present so every shard sees the same common random numbers for its simulants
+        as it would in an unsharded simulation.
     """
 
-    def __init__(self):
+    def __init__(self, shard=None):
         self._population = pd.DataFrame()
         self.growing = False
+        self.shard = shard
+        self._next_id = 0
 
     def get_view(self, columns, query=None):
         """Return a configured PopulationView
@@ -232,7 +246,15 @@ class PopulationManager:
 
     @emits('initialize_simulants')
     def _create_simulants(self, count, emitter, population_configuration=None):
-        new_index = range(len(self._population) + count)
+        if self.shard is None:
+            new_index = range(len(self._population) + count)
+        else:
+            shard, shards = self.shard
+            ids = np.arange(self._next_id, self._next_id + count)
+            new_index = pd.Index(ids[ids % shards == shard])
+            if len(self._population):
+                new_index = self._population.index.append(new_index)
+        self._next_id += count
         new_population = self._population.reindex(new_index)
         index = new_population.index.difference(self._population.index)
         self._population = new_population
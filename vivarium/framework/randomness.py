@@ -28,6 +28,7 @@ RESIDUAL_CHOICE : object
 """
 
 import hashlib
+import weakref
 
 import numpy as np
 import pandas as pd
@@ -259,9 +260,19 @@ class RandomnessStream:
         self.key = key
         self.clock = clock
         self.seed = seed
+        # Held weakly so that copies made for short lived uses don't live as long as this stream.
+        self._copies = weakref.WeakSet()
 
     def copy_with_additional_key(self, key):
-        return RandomnessStream('_'.join([self.key, key]), self.clock, self.seed)
+        copy = RandomnessStream('_'.join([self.key, key]), self.clock, self.seed)
+        self._copies.add(copy)
+        return copy
+
+    def set_seed(self, seed):
+        """Change the seed of this stream and of every stream copied from it."""
+        self.seed = seed
+        for copy in self._copies:
+            copy.set_seed(seed)
 
     def _key(self, additional_key=None):
         """Construct a hashable key from this object's state.
@@ -0,0 +1,421 @@
+"""Compact serialization of simulation results for shipping them between processes and storing them.
+
+Results are encoded as one typed numpy array per dtype in the frame, written with `numpy.save` after
+a JSON header describing the columns and index and compressed, so they keep their dtypes and are small
+and quick to encode and decode.  Strings are stored as UTF-8 byte arrays.  Nothing is pickled, so
+results received from a message broker can be decoded safely.
+
+Results of many runs can be collected in a dataset, a directory partitioned by branch and input
+draw.  Each process appends the runs it finishes to its own HDF table in the run's partition, so no
+locking is needed, and `compact_dataset` later merges each partition into a single HDF file.
+"""
+import base64
+import hashlib
+import io
+import json
+import os
+import logging
+import socket
+import struct
+from time import time
+import zlib
+
+import numpy as np
+import pandas as pd
+
+from vivarium import VivariumError
+
+_MAGIC = b'VIVRES2\n'
+# The header of encoded results is prefixed with its length
+_FRAME = struct.Struct('<Q')
+_PART_SUFFIX = '.hdf'
+_COMPACTED = 'compacted' + _PART_SUFFIX
+# Keys of the results and, in compacted files, the names of the files merged into them
+_RESULTS_KEY = 'results'
+_SOURCES_KEY = 'sources'
+
+_log = logging.getLogger(__name__)
+
+
+class ResultsFormatError(VivariumError):
+    """Raised when data to be decoded was not produced by `encode_results` or results can't be encoded."""
+    pass
+
+
+def _to_storable(values, name):
+    """Convert an array to one `numpy.save` can write without pickling, returning it and its dtype's name."""
+    if values.dtype != object:
+        return values, values.dtype.str
+    if not all(isinstance(value, str) for value in values.flat):
+        raise ResultsFormatError('{} holds values which are neither numbers, dates nor strings'.format(name))
+    return np.char.encode(values.astype(str), 'utf-8'), 'object'
+
+
+def _from_stored(values, dtype):
+    if dtype == 'object':
+        return np.char.decode(values, 'utf-8').astype(object)
+    return values
+
+
+def encode_results(results, text=False):
+    """Encode a DataFrame of results.
+
+    Parameters
+    ----------
+    results : pandas.DataFrame
+    text : bool
+        If True the encoded results are base64 encoded into a str so they can be sent through
+        transports which only handle text, like celery's default json serializer.
+
+    Returns
+    -------
+    bytes or str
+
+    Raises
+    ------
+    ResultsFormatError
+        If a column or index level holds values which are neither numbers, dates nor strings.
+    """
+    index = results.index
+    blocks = {}
+    for position, dtype in enumerate(results.dtypes.values):
+        blocks.setdefault(dtype, []).append(position)
+    if len(blocks) == 1:
+        # Avoid the cost of selecting columns when the frame is homogeneous
+        blocks = [(list(range(len(results.columns))), results.values)]
+    else:
+        blocks = [(positions, results.iloc[:, positions].values) for positions in blocks.values()]
+    arrays = [_to_storable(index.get_level_values(i).values, 'Index level {}'.format(index.names[i]))
+              for i in range(index.nlevels)]
+    arrays += [_to_storable(values, 'Columns {}'.format([results.columns[p] for p in positions]))
+               for positions, values in blocks]
+    header = json.dumps({
+        'index_names': list(index.names),
+        'columns': list(results.columns),
+        'positions': [positions for positions, _ in blocks],
+        'dtypes': [dtype for _, dtype in arrays],
+    }, default=str).encode('utf8')
+
+    buffer = io.BytesIO()
+    buffer.write(_FRAME.pack(len(header)) + header)
+    for values, _ in arrays:
+        np.save(buffer, values, allow_pickle=False)
+    encoded = _MAGIC + zlib.compress(buffer.getvalue())
+    if text:
+        return base64.b64encode(encoded).decode('ascii')
+    return encoded
+
+
+def _load(encoded):
+    if isinstance(encoded, str):
+        encoded = base64.b64decode(encoded)
+    if not encoded.startswith(_MAGIC):
+        raise ResultsFormatError('Data is not in the vivarium results format')
+    try:
+        buffer = io.BytesIO(zlib.decompress(encoded[len(_MAGIC):]))
+        header_length, = _FRAME.unpack(buffer.read(_FRAME.size))
+        header = json.loads(buffer.read(header_length).decode('utf8'))
+        arrays = [_from_stored(np.load(buffer, allow_pickle=False), dtype) for dtype in header['dtypes']]
+    except (zlib.error, struct.error, ValueError, OSError, KeyError, TypeError) as e:
+        raise ResultsFormatError('Corrupt vivarium results: {}'.format(e))
+
+    levels = len(header['index_names'])
+    return {
+        'index_names': header['index_names'],
+        'index': arrays[:levels],
+        'columns': header['columns'],
+        'blocks': list(zip(header['positions'], arrays[levels:])),
+    }
+
+
+def _to_frame(index_names, index, columns, blocks):
+    if len(index) == 1:
+        index = pd.Index(index[0], name=index_names[0])
+    else:
+        index = pd.MultiIndex.from_arrays(index, names=index_names)
+    if not blocks:
+        return pd.DataFrame(index=index, columns=columns)
+
+    frame = pd.concat([pd.DataFrame(values, index=index, columns=[columns[p] for p in positions])
+                       for positions, values in blocks], axis=1)
+    # Put the columns back in their original order
+    return frame.iloc[:, np.argsort([p for positions, _ in blocks for p in positions])]
+
+
+def decode_results(encoded):
+    """Decode results produced by `encode_results`.
+
+    Parameters
+    ----------
+    encoded : bytes or str
+
+    Returns
+    -------
+    pandas.DataFrame
+    """
+    return _to_frame(**_load(encoded))
+
+
+def concat_results(encoded_results):
+    """Combine many encoded results into a single DataFrame.
+
+    When every result has the same columns and index levels, which is the usual case for the runs
+    of a single experiment, each column is concatenated as one array instead of building and then
+    concatenating a frame per result.
+
+    Parameters
+    ----------
+    encoded_results : iterable of bytes or str
+
+    Returns
+    -------
+    pandas.DataFrame
+    """
+    payloads = [_load(encoded) for encoded in encoded_results]
+    if not payloads:
+        return pd.DataFrame()
+
+    def layout(payload):
+        return (payload['columns'], payload['index_names'],
+                [(positions, values.dtype) for positions, values in payload['blocks']])
+
+    first = layout(payloads[0])
+    if any(layout(p) != first for p in payloads):
+        return pd.concat([_to_frame(**p) for p in payloads])
+
+    columns, index_names, blocks = first
+    return _to_frame(index_names,
+                     [np.concatenate([p['index'][i] for p in payloads]) for i in range(len(index_names))],
+                     columns,
+                     [(positions, np.concatenate([p['blocks'][i][1] for p in payloads]))
+                      for i, (positions, _) in enumerate(blocks)])
+
+
+def branch_key(branch_config):
+    """A short stable name for a branch, used as its partition in a results dataset.
+
+    Parameters
+    ----------
+    branch_config : dict or None
+        The branch's configuration overrides, without its draws.
+
+    Returns
+    -------
+    str
+    """
+    if not branch_config:
+        return 'base'
+    return hashlib.sha1(json.dumps(branch_config, sort_keys=True, default=str).encode('utf8')).hexdigest()[:12]
+
+
+def run_branch(run_key):
+    """The branch configuration in a run key, without the run's draws.
+
+    Parameters
+    ----------
+    run_key : dict
+
+    Returns
+    -------
+    dict
+    """
+    return {k: v for k, v in run_key.items() if k not in ['draw', 'input_draw', 'model_draw']}
+
+
+def partition_path(dataset_path, branch, input_draw):
+    """The directory holding the results of one branch and input draw in a dataset."""
+    return os.path.join(dataset_path, 'branch={}'.format(branch), 'input_draw={}'.format(input_draw))
+
+
+def _part_rows(path):
+    """The number of results in a file in a dataset, or None if the file can't be read."""
+    try:
+        with pd.HDFStore(path, mode='r') as store:
+            return store.get_storer(_RESULTS_KEY).nrows
+    except Exception:
+        return None
+
+
+def _read_part(path):
+    """Read the results in a file in a dataset, or None if the file can't be read."""
+    try:
+        return pd.read_hdf(path, _RESULTS_KEY)
+    except Exception:
+        _log.warning('Skipping unreadable results file %s', path, exc_info=True)
+        return None
+
+
+def _set_aside(path):
+    """Move an unreadable file out of the dataset, keeping it for inspection."""
+    corrupt_path = '{}.corrupt-{}'.format(path, int(time()))
+    _log.warning('Moving unreadable results file %s to %s', path, corrupt_path)
+    os.replace(path, corrupt_path)
+
+
+def append_results(dataset_path, results, branch='base', input_draw=0, worker=None, string_size=256):
+    """Append a run's results to a dataset.
+
+    Parameters
+    ----------
+    dataset_path : str
+    results : pandas.DataFrame
+    branch : str
+        The branch's partition, see `branch_key`.
+    input_draw : int
+    worker : str
+        Name of the file in the partition to append to.  Concurrent writers must use different
+        names, so it defaults to one made from the host name and process id.
+    string_size : int
+        Maximum length of strings in the results.  The HDF tables reserve this much space for
+        every string.
+
+    Raises
+    ------
+    ResultsFormatError
+        If a string is longer than ``string_size``.
+    """
+    if worker is None:
+        worker = '{}-{}'.format(socket.gethostname(), os.getpid())
+    strings = [column for column in results.columns if results[column].dtype == object]
+    for column in strings:
+        longest = results[column].astype(str).str.len().max()
+        if longest > string_size:
+            raise ResultsFormatError('{} has values of up to {} characters but string_size is {}'.format(
+                column, longest, string_size))
+
+    directory = partition_path(dataset_path, branch, input_draw)
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, 'part-{}{}'.format(worker, _PART_SUFFIX))
+    if os.path.exists(path) and _part_rows(path) is None:
+        # A crash while appending can leave the file unreadable, and appending to it would fail too.
+        _set_aside(path)
+    results.to_hdf(path, _RESULTS_KEY, format='table', append=True,
+                   min_itemsize={column: string_size for column in strings} or None)
+
+
+def _partitions(dataset_path):
+    for branch in sorted(os.listdir(dataset_path)):
+        branch_path = os.path.join(dataset_path, branch)
+        if branch.startswith('branch=') and os.path.isdir(branch_path):
+            for draw in sorted(os.listdir(branch_path)):
+                if draw.startswith('input_draw='):
+                    yield branch[len('branch='):], draw[len('input_draw='):], os.path.join(branch_path, draw)
+
+
+def _part_files(partition):
+    """The files in a partition which are appended to or being merged, but not the compacted file."""
+    return sorted(os.path.join(partition, name) for name in os.listdir(partition)
+                  if name.endswith(_PART_SUFFIX) and (name.startswith('part-') or name.startswith('merging-')))
+
+
+def _compacted_sources(partition):
+    """The names of the files already merged into the partition's compacted file."""
+    compacted_path = os.path.join(partition, _COMPACTED)
+    if not os.path.exists(compacted_path):
+        return set()
+    return set(pd.read_hdf(compacted_path, _SOURCES_KEY))
+
+
+def _read_partition(partition):
+    frames = []
+    compacted_path = os.path.join(partition, _COMPACTED)
+    if os.path.exists(compacted_path):
+        frames.append(pd.read_hdf(compacted_path, _RESULTS_KEY))
+    merged = _compacted_sources(partition)
+    for path in _part_files(partition):
+        # Files left behind by a compaction which stopped before removing them are already compacted.
+        if os.path.basename(path) not in merged:
+            frame = _read_part(path)
+            if frame is not None:
+                frames.append(frame)
+    return frames
+
+
+def read_dataset(dataset_path, branch=None, input_draw=None):
+    """Read the results in a dataset into a single DataFrame.
+
+    Files which can't be read, like one left by a crash while it was written, are skipped with a
+    warning.
+
+    Parameters
+    ----------
+    dataset_path : str
+    branch : str
+        If given, only read this branch's partition.
+    input_draw : int
+        If given, only read this input draw's partitions.
+
+    Returns
+    -------
+    pandas.DataFrame
+    """
+    frames = []
+    for partition_branch, partition_draw, partition in _partitions(dataset_path):
+        if branch is not None and partition_branch != branch:
+            continue
+        if input_draw is not None and partition_draw != str(input_draw):
+            continue
+        frames.extend(_read_partition(partition))
+    if not frames:
+        return pd.DataFrame()
+    return pd.concat(frames)
+
+
+def compact_dataset(dataset_path):
+    """Merge the files in each partition of a dataset into one.
+
+    The files being merged are first renamed so that writers start new ones, and the compacted file
+    records their names so that readers ignore them if compaction stops before they are removed.
+    This should only be run once nothing is writing to the dataset.
+
+    Parameters
+    ----------
+    dataset_path : str
+
+    Returns
+    -------
+    int
+        The number of files merged.
+    """
+    merged = 0
+    for _, _, partition in _partitions(dataset_path):
+        compacted_path = os.path.join(partition, _COMPACTED)
+        already_merged = _compacted_sources(partition)
+        paths = []
+        for path in _part_files(partition):
+            if os.path.basename(path) in already_merged:
+                os.remove(path)
+            else:
+                paths.append(path)
+        if not paths:
+            continue
+
+        generation = '{}-{}'.format(os.getpid(), int(time()*1000))
+        merging = []
+        for path in paths:
+            name = os.path.basename(path)
+            if name.startswith('part-'):
+                # Unique names so that files from a compaction which stopped part way are never overwritten.
+                merging_path = os.path.join(partition, 'merging-{}-{}'.format(generation, name[len('part-'):]))
+                os.replace(path, merging_path)
+                path = merging_path
+            if _part_rows(path) is None:
+                _set_aside(path)
+            else:
+                merging.append(path)
+
+        frames = []
+        if os.path.exists(compacted_path):
+            frames.append(pd.read_hdf(compacted_path, _RESULTS_KEY))
+            merged += 1
+        frames.extend(pd.read_hdf(path, _RESULTS_KEY) for path in merging)
+        temporary_path = os.path.join(partition, 'compacting.{}.tmp'.format(os.getpid()))
+        if os.path.exists(temporary_path):
+            os.remove(temporary_path)
+        pd.concat(frames).to_hdf(temporary_path, _RESULTS_KEY, format='table')
+        pd.Series([os.path.basename(path) for path in merging]).to_hdf(temporary_path, _SOURCES_KEY, format='table')
+        os.replace(temporary_path, compacted_path)
+        for path in merging:
+            os.remove(path)
+        merged += len(paths)
+    return merged
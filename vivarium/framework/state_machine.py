@@ -1,13 +1,25 @@
 """A framework for generic state machines."""
+from collections import deque
 from enum import Enum
+import heapq
 
 import pandas as pd
 import numpy as np
 
+from .util import from_yearly, rate_to_probability
+
 
 def _next_state(index, event_time, transition_set, population_view):
     """Moves a population between different states using information from a `TransitionSet`.
 
+    Chains of `TransientState` objects are resolved iteratively, one hop at a time.  Each hop
+    makes a single decision for the simulants still in transit, writes the states they enter
+    to the population table in one update and then runs those states' side effects.  The
+    population table is therefore written once per hop rather than once at the end, so side
+    effects always see the states their simulants have just entered.  States which override
+    ``transition_effect`` or, for transient states, ``next_state`` are handed their simulants
+    through those methods instead.
+
     Parameters
     ----------
     index : iterable of ints
@@ -18,27 +30,70 @@ def _next_state(index, event_time, transition_set, population_view):
         A set of potential transitions available to the simulants.
     population_view : vivarium.framework.population.PopulationView
         A view of the internal state of the simulation.
+
+    Raises
+    ------
+    ValueError
+        If a transition output is not a `State` or a simulant would pass through
+        the same transient state twice in a single transition.
     """
 
     if len(transition_set) == 0 or index.empty:
         return
 
-    outputs, decisions = transition_set.choose_new_state(index)
-    groups = _groupby_new_state(index, outputs, decisions)
-
-    if groups:
-        for output, affected_index in sorted(groups, key=lambda x: str(x[0])):
-            if output == 'null_transition':
-                pass
-            elif isinstance(output, Transient):
+    # Each entry is (transition set, simulants, transient states already visited).
+    hop = [(transition_set, index, ())]
+    while hop:
+        entered = []
+        for current_set, current_index, visited in hop:
+            outputs, decisions = current_set.choose_new_state(current_index)
+            groups = _groupby_new_state(current_index, outputs, decisions)
+
+            for output, affected_index in sorted(groups, key=lambda x: str(x[0])):
+                affected_index = pd.Index(affected_index)
+                if affected_index.empty or output == 'null_transition':
+                    # Simulants that don't move stay in the state they were last written in.
+                    continue
                 if not isinstance(output, State):
                     raise ValueError('Invalid transition output: {}'.format(output))
-                output.transition_effect(affected_index, event_time, population_view)
-                output.next_state(affected_index, event_time, population_view)
-            elif isinstance(output, State):
-                output.transition_effect(affected_index, event_time, population_view)
-            else:
-                raise ValueError('Invalid transition output: {}'.format(output))
+                if output in visited:
+                    raise ValueError('Cycle detected among transient states: {}'.format(
+                        list(visited) + [output]))
+                entered.append((output, affected_index, visited))
+
+        _enter_states(entered, event_time, population_view)
+
+        hop = []
+        for state, affected_index, visited in entered:
+            if isinstance(state, Transient):
+                if type(state).next_state is not State.next_state:
+                    state.next_state(affected_index, event_time, population_view)
+                elif len(state.transition_set):
+                    hop.append((state.transition_set, affected_index, visited + (state,)))
+
+
+def _enter_states(entered, event_time, population_view):
+    """Writes the states entered in a single hop and then applies their side effects.
+
+    Parameters
+    ----------
+    entered : list of 3-tuples
+        The state entered, the simulants entering it and the transient states they have
+        already passed through.
+    event_time : pandas.Timestamp
+        When this transition is occuring.
+    population_view : vivarium.framework.population.PopulationView
+        A view of the internal state of the simulation.
+    """
+    default = [(state, index) for state, index, _ in entered
+               if type(state).transition_effect is State.transition_effect]
+    if default:
+        population_view.update(pd.concat([pd.Series(state.state_id, index=index) for state, index in default]))
+    for state, index, _ in entered:
+        if type(state).transition_effect is State.transition_effect:
+            state._transition_side_effect(index, event_time)
+        else:
+            state.transition_effect(index, event_time, population_view)
 
 
 def _groupby_new_state(index, outputs, decisions):
@@ -105,6 +160,13 @@ class Transition:
     def setup(self, builder):
         pass
 
+    def get_state(self):
+        """The simulants for which this transition is active, for checkpointing."""
+        return self._active_index
+
+    def set_state(self, state):
+        self._active_index = state
+
     def set_active(self, index):
         if self._active_index is None:
             raise ValueError("This transition is not triggered.  An active index cannot be set or modified.")
@@ -249,6 +311,136 @@ class TransientState(State, Transient):
         return 'TransientState({})'.format(self.state_id)
 
 
+class ScheduledState(State):
+    """A state in which each simulant samples the time until its next transition on entry.
+
+    When used in a `Machine` with event time scheduling enabled, simulants in this
+    state are only evaluated once their scheduled time arrives, at which point one
+    of the state's transitions is chosen for them.
+
+    Parameters
+    ----------
+    sojourn_time : callable
+        Takes an index of simulants entering the state and returns the time each
+        will spend in the state, either as `pandas.Timedelta` values or as a number
+        of days.
+    """
+    def __init__(self, state_id, sojourn_time, key='state'):
+        super().__init__(state_id, key=key)
+        self._sojourn_time = sojourn_time
+
+    def sojourn_time(self, index):
+        """Samples the time until the next transition for simulants entering this state.
+
+        Parameters
+        ----------
+        index : iterable of ints
+            An iterable of integer labels for the simulants.
+
+        Returns
+        -------
+        `pandas.Series`
+            A series of `pandas.Timedelta` values indexed by the provided index.
+        """
+        sojourn_time = pd.Series(self._sojourn_time(index), index=index)
+        if not np.issubdtype(sojourn_time.dtype, np.timedelta64):
+            sojourn_time = pd.to_timedelta(sojourn_time, unit='D')
+        return sojourn_time
+
+    def __repr__(self):
+        return 'ScheduledState({})'.format(self.state_id)
+
+
+class _EventCalendar:
+    """A bucketed calendar queue of the times at which simulants next need attention.
+
+    Simulants are kept in buckets of a fixed width ordered by a heap.  Each simulant's
+    authoritative event time is held in an array indexed by simulant id so that
+    rescheduling only requires adding the simulant to a new bucket.  Stale entries
+    in old buckets are discarded when those buckets are popped.
+    """
+    _UNSCHEDULED = np.iinfo(np.int64).max
+
+    def __init__(self, resolution=pd.Timedelta(days=1)):
+        self._resolution = resolution.value
+        self._heap = []
+        self._buckets = {}
+        self._event_times = np.full(0, self._UNSCHEDULED, dtype=np.int64)
+
+    def scheduled(self, index):
+        """Returns the members of the index that have a pending event."""
+        ids = np.asarray(index, dtype=np.int64)
+        known = ids < len(self._event_times)
+        known[known] = self._event_times[ids[known]] != self._UNSCHEDULED
+        return pd.Index(index)[known]
+
+    def schedule(self, index, times):
+        """Sets the next event time for each simulant in the index.
+
+        Parameters
+        ----------
+        index : `pandas.Index`
+            The simulants to schedule.
+        times : `pandas.Series`
+            The event time for each simulant as `pandas.Timestamp` values.
+        """
+        if len(index) == 0:
+            return
+        ids = np.asarray(index, dtype=np.int64)
+        if ids.max() >= len(self._event_times):
+            grown = np.full(ids.max() + 1, self._UNSCHEDULED, dtype=np.int64)
+            grown[:len(self._event_times)] = self._event_times
+            self._event_times = grown
+        times = np.asarray(times, dtype='datetime64[ns]').astype(np.int64)
+        self._event_times[ids] = times
+
+        bucket_keys = times // self._resolution
+        for bucket_key in np.unique(bucket_keys):
+            if bucket_key not in self._buckets:
+                self._buckets[bucket_key] = []
+                heapq.heappush(self._heap, bucket_key)
+            self._buckets[bucket_key].append(ids[bucket_keys == bucket_key])
+
+    def unschedule(self, index):
+        """Removes any pending event for the simulants in the index."""
+        ids = np.asarray(index, dtype=np.int64)
+        ids = ids[ids < len(self._event_times)]
+        self._event_times[ids] = self._UNSCHEDULED
+
+    def pop_due(self, time):
+        """Removes and returns all simulants whose event time is at or before the given time.
+
+        Parameters
+        ----------
+        time : `pandas.Timestamp`
+
+        Returns
+        -------
+        `pandas.Index`
+            The simulants whose events are due.
+        """
+        time = pd.Timestamp(time).value
+        due = []
+        while self._heap and self._heap[0] <= time // self._resolution:
+            bucket_key = heapq.heappop(self._heap)
+            ids = np.unique(np.concatenate(self._buckets.pop(bucket_key)))
+            event_times = self._event_times[ids]
+            due.append(ids[event_times <= time])
+            # Keep simulants whose events fall later in this same bucket.  Anything else is stale.
+            later = ids[(event_times > time) & (event_times // self._resolution == bucket_key)]
+            if len(later):
+                self._buckets[bucket_key] = [later]
+                heapq.heappush(self._heap, bucket_key)
+                break
+        # A simulant rescheduled into a later bucket which is also due is in both buckets.
+        due = np.unique(np.concatenate(due)) if due else np.array([], dtype=np.int64)
+        self._event_times[due] = self._UNSCHEDULED
+        return pd.Index(due)
+
+    def __repr__(self):
+        return '_EventCalendar(buckets= {})'.format(len(self._buckets))
+
+
 class TransitionSet:
     """A container for state machine transitions.
 
@@ -373,10 +565,15 @@ class Machine:
         A label for the piece of simulation state governed by this state machine.
     population_view : `pandas.DataFrame`
         A view of the internal state of the simulation.
+    event_time_scheduling : bool
+        If True, simulants in a `ScheduledState` are held in a time ordered calendar
+        and only evaluated once their sampled time in that state has elapsed.
+        Simulants in any other kind of state are evaluated every step.
     """
-    def __init__(self, state_column, states=None):
+    def __init__(self, state_column, states=None, event_time_scheduling=False):
         self.states = []
         self.state_column = state_column
+        self.event_time_scheduling = event_time_scheduling
         if states:
             self.add_states(states)
 
@@ -395,8 +592,19 @@ class Machine:
             This component's sub-components.
         """
         self.population_view = builder.population_view([self.state_column])
+        if self.event_time_scheduling:
+            self.clock = builder.clock()
+            self._calendar = _EventCalendar()
         return self.states
 
+    def get_state(self):
+        """The event calendar when using event time scheduling, for checkpointing."""
+        return self._calendar if self.event_time_scheduling else None
+
+    def set_state(self, state):
+        if self.event_time_scheduling:
+            self._calendar = state
+
     def add_states(self, states):
         for state in states:
             self.states.append(state)
@@ -412,9 +620,45 @@ class Machine:
         event_time : pandas.Timestamp
             The time at which this transition occurs.
         """
+        if self.event_time_scheduling:
+            index = self._scheduled_transition_index(index, event_time)
         for state, affected in self._get_state_pops(index):
             if not affected.empty:
                 state.next_state(affected.index, event_time, self.population_view)
+        if self.event_time_scheduling:
+            self._schedule(index, event_time)
+
+    def _scheduled_transition_index(self, index, event_time):
+        """Finds the simulants that need to be evaluated this step under event time scheduling.
+
+        Simulants seen in a `ScheduledState` for the first time are scheduled from the
+        start of the current step.  The result contains every simulant whose scheduled
+        time has arrived along with every simulant in a state that is not scheduled.
+        Simulants whose time arrives while they are not in the index, like those who have
+        died, are dropped from the calendar and scheduled afresh if they are seen again.
+        """
+        index = pd.Index(index)
+        # Only the machine moves simulants between states, so those with a pending event are known to
+        # be in a scheduled state and don't need to be looked up.
+        population = self.population_view.get(index.difference(self._calendar.scheduled(index)))
+        scheduled_ids = [state.state_id for state in self.states if isinstance(state, ScheduledState)]
+        in_scheduled_state = population[self.state_column].isin(scheduled_ids)
+        self._schedule(population.index[in_scheduled_state], self.clock())
+
+        due = self._calendar.pop_due(event_time)
+        return population.index[~in_scheduled_state].union(due.intersection(index))
+
+    def _schedule(self, index, entry_time):
+        """Samples the next event time for each simulant in the index based on its current state."""
+        if len(index) == 0:
+            return
+        population = self.population_view.get(index)
+        self._calendar.unschedule(population.index)
+        for state in self.states:
+            if isinstance(state, ScheduledState):
+                affected = population.index[population[self.state_column] == state.state_id]
+                if not affected.empty:
+                    self._calendar.schedule(affected, entry_time + state.sojourn_time(affected))
 
     def cleanup(self, index, event_time):
         for state, affected in self._get_state_pops(index):
@@ -446,3 +690,139 @@ class Machine:
 
     def __repr__(self):
         return "Machine(states= {}, state_column= {})".format(self.states, self.state_column)
+
+
+class MarkovMachine:
+    """A state machine whose transitions are driven by a table of constant rates.
+
+    This is a high throughput alternative to building a `Machine` out of `State`
+    and `Transition` objects for models where the transition rates depend only on
+    the current state and a set of categorical key columns.  The rate table is
+    compiled into a transition probability matrix for each key group and all
+    simulants are advanced with a single gather from that matrix and a single
+    random choice.
+
+    Attributes
+    ----------
+    state_column : str
+        A label for the piece of simulation state governed by this state machine.
+    states : list of str
+        The names of the states in this machine.
+    key_columns : list of str
+        Population columns used to select between transition matrices.
+
+    Parameters
+    ----------
+    transition_rates : `pandas.DataFrame`
+        A table with ``from_state``, ``to_state`` and ``rate`` columns along with one
+        column for each of the `key_columns`.  Rates are annual and any transition
+        missing from the table has a rate of zero.
+    """
+    def __init__(self, state_column, states, transition_rates, key_columns=()):
+        self.state_column = state_column
+        self.states = list(states)
+        self.key_columns = list(key_columns)
+        self._groups, self._rates = self._compile_rates(transition_rates)
+        self._step_size = None
+        self._probabilities = None
+
+    def setup(self, builder):
+        """Performs this component's simulation setup.
+
+        Parameters
+        ----------
+        builder : `engine.Builder`
+            Interface to several simulation tools including access to common random
+            number generation, in particular.
+        """
+        self.population_view = builder.population_view([self.state_column] + self.key_columns)
+        self.random = builder.randomness('markov_machine.{}'.format(self.state_column))
+        self.step_size = builder.step_size()
+
+    def _compile_rates(self, transition_rates):
+        """Arranges the rate table into an array indexed by key group, source state and destination state."""
+        required_columns = set(self.key_columns) | {'from_state', 'to_state', 'rate'}
+        missing_columns = required_columns - set(transition_rates.columns)
+        if missing_columns:
+            raise ValueError('Transition rate table is missing columns: {}'.format(sorted(missing_columns)))
+
+        state_codes = {state: i for i, state in enumerate(self.states)}
+        unknown_states = (set(transition_rates.from_state) | set(transition_rates.to_state)) - set(state_codes)
+        if unknown_states:
+            raise ValueError('Transition rate table references unknown states: {}'.format(sorted(unknown_states)))
+        if (transition_rates.from_state == transition_rates.to_state).any():
+            raise ValueError('Transition rate table contains self transitions.')
+
+        if self.key_columns:
+            groups = self._key_index(transition_rates.drop_duplicates(self.key_columns))
+            group_codes = groups.get_indexer(self._key_index(transition_rates))
+        else:
+            groups = None
+            group_codes = np.zeros(len(transition_rates), dtype=int)
+
+        rates = np.zeros((len(groups) if groups is not None else 1, len(self.states), len(self.states)))
+        np.add.at(rates, (group_codes,
+                          transition_rates.from_state.map(state_codes).values,
+                          transition_rates.to_state.map(state_codes).values), transition_rates.rate.values)
+        return groups, rates
+
+    def _key_index(self, table):
+        if len(self.key_columns) == 1:
+            return pd.Index(table[self.key_columns[0]].values)
+        return pd.MultiIndex.from_arrays([table[column].values for column in self.key_columns])
+
+    def transition_probabilities(self, step_size):
+        """Gets the per step transition probability matrices.
+
+        Parameters
+        ----------
+        step_size : pandas.Timedelta
+            The size of the simulation time step.
+
+        Returns
+        -------
+        ndarray
+            An array of shape (key groups, states, states) whose rows sum to 1.
+        """
+        if step_size != self._step_size:
+            total_rates = self._rates.sum(axis=2)
+            with np.errstate(divide='ignore', invalid='ignore', under='ignore'):
+                exit_probabilities = rate_to_probability(from_yearly(total_rates, step_size))
+                shares = np.where(total_rates[..., np.newaxis] > 0,
+                                  self._rates / total_rates[..., np.newaxis], 0)
+            probabilities = shares * exit_probabilities[..., np.newaxis]
+            diagonal = np.arange(len(self.states))
+            probabilities[:, diagonal, diagonal] = 1 - exit_probabilities
+            self._step_size, self._probabilities = step_size, probabilities
+        return self._probabilities
+
+    def transition(self, index, event_time):
+        """Moves every simulant in the index to its next state.
+
+        Parameters
+        ----------
+        index : iterable of ints
+            An iterable of integer labels for the simulants.
+        event_time : pandas.Timestamp
+            The time at which this transition occurs.
+        """
+        population = self.population_view.get(index)
+        if population.empty:
+            return
+
+        state_codes = pd.Categorical(population[self.state_column], categories=self.states).codes
+        if self.key_columns:
+            group_codes = self._groups.get_indexer(self._key_index(population))
+        else:
+            group_codes = np.zeros(len(population), dtype=int)
+        if np.any(state_codes < 0) or np.any(group_codes < 0):
+            raise ValueError('Simulants found in states or key groups not covered by this machine.')
+
+        probabilities = self.transition_probabilities(self.step_size())[group_codes, state_codes]
+        new_states = self.random.choice(population.index, self.states, probabilities)
+        new_states.name = self.state_column
+        self.population_view.update(new_states)
+
+    def __repr__(self):
+        return "MarkovMachine(states= {}, state_column= {}, key_columns= {})".format(
+            self.states, self.state_column, self.key_columns)
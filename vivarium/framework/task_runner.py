@@ -0,0 +1,226 @@
+"""Running simulation jobs on a worker, either through celery or on a local process pool.
+
+A job is the tuple of arguments taken by `vivarium.framework.celery_tasks.worker`:
+``(input_draw_number, model_draw_number, component_config, branch_config, logging_directory)``.
+"""
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from copy import deepcopy
+import hashlib
+import json
+import logging
+import os
+from time import time
+
+from vivarium import VivariumError
+
+_log = logging.getLogger(__name__)
+
+# The simulation most recently set up by this worker process as (key, simulation), see _prepared_simulation.
+_prepared = None
+# The global configuration as it was before this worker ran its first job.
+_initial_config = None
+
+
+class TaskRunnerError(VivariumError):
+    """Raised when jobs still fail after exhausting their retries."""
+    pass
+
+
+def _prepared_simulation(input_draw_number, component_config, branch_config):
+    """Get a set up simulation for a job, reusing the previous job's if it used the same model.
+
+    Setup, which is where input data is loaded and lookup tables are built, depends on the
+    components, the branch and the input draw but not on the model draw, so consecutive jobs
+    which only differ in model draw share a single setup.
+    """
+    global _prepared, _initial_config
+    from vivarium import config
+    from vivarium.framework.engine import configure, setup_simulation
+    from vivarium.framework.components import load_component_manager
+
+    key = job_key((input_draw_number, None, component_config, branch_config))
+    if _prepared is None or _prepared[0] != key:
+        _prepared = None
+        if _initial_config is None:
+            _initial_config = config.frozen_copy()
+        config.rebase(_initial_config)
+
+        logging.info('Setting up simulation {}'.format(key))
+        configure(input_draw_number=input_draw_number, simulation_config=branch_config)
+        component_manager = load_component_manager(deepcopy(component_config))
+        _prepared = (key, setup_simulation(component_manager))
+    return _prepared[1]
+
+
+def _run_prepared(simulation, model_draw_number, run_configuration):
+    from vivarium import config
+    from vivarium.framework.engine import run_prepared
+
+    config.read_dict({'run_configuration': run_configuration}, layer='model_override', source='worker')
+    return run_prepared(simulation, model_draw_number)
+
+
+def run_job(input_draw_number, model_draw_number, component_config, branch_config, logging_directory,
+            worker_name=None):
+    """Run a single job and return its metrics encoded with `vivarium.framework.results.encode_results`.
+
+    Parameters
+    ----------
+    input_draw_number : int
+    model_draw_number : int
+    component_config : dict
+        Parsed component configuration.
+    branch_config : dict or None
+        Configuration overrides for the branch being run.
+    logging_directory : str
+        Directory for the worker's log file.
+    worker_name :
+        Name for the worker's log file and run ids. Defaults to the process id.
+
+    Returns
+    -------
+    str
+    """
+    # Deferred so that the module can be imported by the celery client without loading the scientific stack.
+    import numpy as np
+    import pandas as pd
+
+    np.random.seed([input_draw_number, model_draw_number])
+    worker_name = os.getpid() if worker_name is None else worker_name
+    logging.basicConfig(format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+                        filename=os.path.join(logging_directory, str(worker_name)+'.log'), level=logging.DEBUG)
+    logging.info('Starting job: {}'.format((input_draw_number, model_draw_number, component_config, branch_config)))
+
+    run_configuration = dict(component_config['configuration'].get('run_configuration', {}))
+    run_configuration['run_id'] = str(worker_name)+'_'+str(time())
+    if branch_config is not None:
+        run_configuration['run_key'] = dict(branch_config)
+        run_configuration['run_key']['input_draw'] = input_draw_number
+        run_configuration['run_key']['model_draw'] = model_draw_number
+
+    try:
+        from vivarium.framework.util import run_in_fork
+        from vivarium.framework.results import encode_results
+
+        simulation = _prepared_simulation(input_draw_number, component_config, branch_config)
+        # The run happens in a child process so the prepared simulation is left as it was for the next job.
+        results = run_in_fork(_run_prepared, simulation, model_draw_number, run_configuration)
+        idx = pd.MultiIndex.from_tuples([(input_draw_number, model_draw_number)],
+                                        names=['input_draw_number', 'model_draw_number'])
+        # Encoded as text because celery's default json serializer can't carry bytes.
+        # Use vivarium.framework.results.concat_results to combine the results of many jobs.
+        return encode_results(pd.DataFrame(results, index=idx), text=True)
+    except Exception:
+        logging.exception('Unhandled exception in worker')
+        raise
+    finally:
+        logging.info('Exiting job: {}'.format((input_draw_number, model_draw_number, component_config, branch_config)))
+
+
+def job_key(job):
+    """A stable identifier for a job which ignores its logging directory."""
+    input_draw_number, model_draw_number, component_config, branch_config = job[:4]
+    return hashlib.sha1(json.dumps([input_draw_number, model_draw_number, component_config, branch_config],
+                                   sort_keys=True, default=str).encode('utf8')).hexdigest()
+
+
+class LocalTaskRunner:
+    """Runs jobs on a local process pool without a celery broker.
+
+    Failed jobs are retried like the celery worker's ``autoretry_for=(Exception,), max_retries=2``, so
+    each job is attempted at most ``max_retries + 1`` times.  If a manifest path is given then every
+    completed job is appended to it along with its results, and jobs already in the manifest are
+    not run again, so a sweep which crashed can be resumed by running it again.
+
+    Parameters
+    ----------
+    workers : int
+        Number of worker processes. Defaults to the number of CPUs.
+    max_retries : int
+    manifest_path : str
+        Path to a json lines file recording completed jobs.
+    """
+
+    def __init__(self, workers=None, max_retries=2, manifest_path=None):
+        self.workers = workers
+        self.max_retries = max_retries
+        self.manifest_path = manifest_path
+
+    def _load_manifest(self):
+        completed = {}
+        if self.manifest_path and os.path.exists(self.manifest_path):
+            with open(self.manifest_path) as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # A line only partly written before a crash
+                        continue
+                    completed[record['key']] = record['results']
+        return completed
+
+    def _repair_manifest(self):
+        """Cut off a line left partly written by a crash so that new records start on a line of their own."""
+        if not self.manifest_path or not os.path.exists(self.manifest_path):
+            return
+        with open(self.manifest_path, 'rb+') as f:
+            data = f.read()
+            if data and not data.endswith(b'\n'):
+                f.truncate(data.rfind(b'\n') + 1)
+
+    def _record(self, manifest, job, results):
+        input_draw_number, model_draw_number, _, branch_config = job[:4]
+        manifest.write(json.dumps({'key': job_key(job), 'input_draw_number': input_draw_number,
+                                   'model_draw_number': model_draw_number, 'branch_config': branch_config,
+                                   'results': results}, default=str) + '\n')
+        manifest.flush()
+
+    def run(self, jobs):
+        """Run the jobs and return their encoded results in the same order.
+
+        Raises
+        ------
+        TaskRunnerError
+            If any job failed on every attempt.  The results of the jobs that succeeded are
+            still recorded in the manifest.
+        """
+        jobs = list(jobs)
+        completed = self._load_manifest()
+        results = [completed.get(job_key(job)) for job in jobs]
+        queue = [i for i, result in enumerate(results) if result is None]
+        if len(queue) < len(jobs):
+            _log.info('Skipping %s jobs already in the manifest', len(jobs) - len(queue))
+
+        attempts = [0]*len(jobs)
+        failures = {}
+        self._repair_manifest()
+        manifest = open(self.manifest_path, 'a') if self.manifest_path else None
+        try:
+            while queue:
+                # A fresh pool for each round of retries in case a crashing job broke the last one.
+                with ProcessPoolExecutor(max_workers=self.workers) as executor:
+                    futures = {executor.submit(run_job, *jobs[i]): i for i in queue}
+                    queue = []
+                    for future in as_completed(futures):
+                        i = futures[future]
+                        try:
+                            results[i] = future.result()
+                        except Exception as e:
+                            attempts[i] += 1
+                            if attempts[i] > self.max_retries:
+                                _log.error('Job %s failed after %s attempts: %r', jobs[i][:2], attempts[i], e)
+                                failures[i] = e
+                            else:
+                                _log.warning('Retrying job %s after error: %r', jobs[i][:2], e)
+                                queue.append(i)
+                            continue
+                        if manifest:
+                            self._record(manifest, jobs[i], results[i])
+        finally:
+            if manifest:
+                manifest.close()
+
+        if failures:
+            raise TaskRunnerError('{} of {} jobs failed: {}'.format(
+                len(failures), len(jobs), {jobs[i][:2]: repr(e) for i, e in failures.items()}))
+        return results
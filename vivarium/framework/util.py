@@ -1,9 +1,19 @@
 from functools import wraps
+import os
+import pickle
+import sys
+from weakref import WeakKeyDictionary
 
 import numpy as np
 
+# The attribute names used by every marker and resource injector, so components can be scanned for all of them at once.
+_marker_attributes = set()
+# Maps classes to the names of their class level attributes which carry markers.
+_marked_class_attributes = WeakKeyDictionary()
+
 
 def marker_factory(marker_attribute, with_priority=False):
+    _marker_attributes.add(marker_attribute)
     if with_priority:
         def decorator(label, priority=5):
             def wrapper(func):
@@ -32,6 +42,7 @@ def marker_factory(marker_attribute, with_priority=False):
 
 
 def resource_injector(marker_attribute):
+    _marker_attributes.add(marker_attribute)
     injector = [lambda args, *injector_args, **injector_kwargs: args]
 
     def decorator(*injector_args, **injector_kwargs):
@@ -61,6 +72,45 @@ def resource_injector(marker_attribute):
     return decorator
 
 
+def _is_marked(value):
+    return any(hasattr(value, marker_attribute) for marker_attribute in _marker_attributes)
+
+
+def marked_attributes(component):
+    """Finds the attributes of a component which have been decorated by a marker or resource injector.
+
+    The scan of class level attributes is done once per class and cached, so only attributes
+    stored directly on an instance need to be inspected for each new component.
+
+    Parameters
+    ----------
+    component : object
+        A simulation component.
+
+    Returns
+    -------
+    list of (str, object) tuples
+        The name and value of each marked attribute, sorted by name.
+    """
+    cls = component if isinstance(component, type) else type(component)
+    try:
+        names = _marked_class_attributes[cls]
+    except (KeyError, TypeError):
+        names = [name for name in dir(cls) if _is_marked(getattr(cls, name, None))]
+        try:
+            _marked_class_attributes[cls] = names
+        except TypeError:
+            # Some builtin types can't be weakly referenced.  They are cheap to rescan.
+            pass
+
+    if not isinstance(component, type) and hasattr(component, '__dict__'):
+        instance_names = [name for name, value in vars(component).items() if _is_marked(value)]
+        if instance_names:
+            names = set(names).union(instance_names)
+
+    return [(name, getattr(component, name)) for name in sorted(names)]
+
+
 def from_yearly(value, time_step):
     return value * (time_step.total_seconds() / (60*60*24*365.0))
 
@@ -88,6 +138,71 @@ def collapse_nested_dict(d, prefix=None):
     return results
 
 
+def _collapse_branch_template(template):
+    """Flatten a branch template into sorted (dotted key, list of values) pairs."""
+    return [(k, v if isinstance(v, list) else [v]) for k, v in sorted(collapse_nested_dict(template))]
+
+
+def _branch_template_size(template):
+    size = 1
+    for _, values in template:
+        size *= len(values)
+    return size
+
+
+def _build_branch(template, index):
+    """Build the nested dict for the branch at ``index`` within a collapsed template.
+
+    The index is read as a mixed radix number whose first digit belongs to the first key,
+    so the first key changes fastest.
+    """
+    root = {}
+    for k, values in template:
+        index, position = divmod(index, len(values))
+        current = root
+        *ks, k = k.split('.')
+        for sub_k in ks:
+            current = current.setdefault(sub_k, {})
+        current[k] = values[position]
+    return root
+
+
+def iter_branch_templates(templates):
+    """Lazily expand branch templates, yielding one branch at a time.
+
+    Branches are produced in the same order as `expand_branch_templates`, so the n-th
+    branch yielded is the one returned by ``get_branch(templates, n)``.
+    """
+    for template in templates:
+        template = _collapse_branch_template(template)
+        for index in range(_branch_template_size(template)):
+            yield _build_branch(template, index)
+
+
+def branch_count(templates):
+    """Count the branches the templates expand to without expanding them."""
+    return sum(_branch_template_size(_collapse_branch_template(template)) for template in templates)
+
+
+def get_branch(templates, index):
+    """Reconstruct the branch at position ``index`` of the expanded templates.
+
+    Raises
+    ------
+    IndexError
+        If index is outside the range of expanded branches.
+    """
+    if index < 0:
+        raise IndexError(index)
+    for template in templates:
+        template = _collapse_branch_template(template)
+        size = _branch_template_size(template)
+        if index < size:
+            return _build_branch(template, index)
+        index -= size
+    raise IndexError(index)
+
+
 def expand_branch_templates(templates):
     """
     Take a list of dictionaries of configuration values (like the ones used in
@@ -103,50 +218,57 @@ def expand_branch_templates(templates):
 
     [
         {'a': {'b': 1, 'c': 3, 'd': 4}},
-        {'a': {'b': 2, 'c': 3, 'd': 5}},
-        {'a': {'b': 1, 'c': 3, 'd': 6}},
         {'a': {'b': 2, 'c': 3, 'd': 4}},
         {'a': {'b': 1, 'c': 3, 'd': 5}},
+        {'a': {'b': 2, 'c': 3, 'd': 5}},
+        {'a': {'b': 1, 'c': 3, 'd': 6}},
         {'a': {'b': 2, 'c': 3, 'd': 6}}
     ]
 
+    See `iter_branch_templates` for a lazy version.
+    """
+    return list(iter_branch_templates(templates))
+
+
+def run_in_fork(func, *args, **kwargs):
+    """Call ``func`` in a forked child process and return its result.
+
+    The child starts with a copy of this process's state and whatever ``func`` does to that state
+    is discarded when the child exits, which makes this a cheap way to run something which
+    consumes expensive to build state, like a fully set up simulation, more than once.
+
+    Raises
+    ------
+    Exception
+        Whatever ``func`` raised, or ChildProcessError if the child died without reporting back.
     """
-    expanded_branches = []
-
-    for branch in templates:
-        branch = sorted(collapse_nested_dict(branch))
-        branch = [(k, v if isinstance(v, list) else [v]) for k, v in branch]
-        expanded_size = np.product([len(v) for k, v in branch])
-        new_branches = []
-        pointers = {k:0 for k, _ in branch}
-        for _ in range(expanded_size):
-            new_branch = []
-            tick = True
-            for k, v in branch:
-                new_branch.append((k, v[pointers[k]]))
-                if tick:
-                    i = pointers[k]+1
-                    if i < len(v):
-                        tick = False
-                        pointers[k] = i
-                    else:
-                        pointers[k] = 0
-            new_branches.append(new_branch)
-        expanded_branches.extend(new_branches)
-
-    final_branches = []
-    for branch in expanded_branches:
-        root = {}
-        final_branches.append(root)
-        for k, v in branch:
-            current = root
-            *ks, k = k.split('.')
-            for sub_k in ks:
-                if sub_k in current:
-                    current = current[sub_k]
-                else:
-                    current[sub_k] = {}
-                    current = current[sub_k]
-            current[k] = v
-
-    return final_branches
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.close(read_fd)
+        try:
+            try:
+                outcome = (True, func(*args, **kwargs))
+            except BaseException as e:
+                outcome = (False, e)
+            try:
+                data = pickle.dumps(outcome)
+            except Exception as e:
+                data = pickle.dumps((False, ChildProcessError('Could not return result from child: {!r}'.format(e))))
+            with os.fdopen(write_fd, 'wb') as f:
+                f.write(data)
+            sys.stdout.flush()
+            sys.stderr.flush()
+        finally:
+            os._exit(0)
+
+    os.close(write_fd)
+    with os.fdopen(read_fd, 'rb') as f:
+        data = f.read()
+    _, status = os.waitpid(pid, 0)
+    if not data:
+        raise ChildProcessError('Forked process exited with status {} without a result'.format(status))
+    succeeded, result = pickle.loads(data)
+    if not succeeded:
+        raise result
+    return result
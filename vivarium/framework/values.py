@@ -6,7 +6,7 @@ import pandas as pd
 
 from vivarium import config, VivariumError
 
-from .util import marker_factory, from_yearly
+from .util import marker_factory, from_yearly, marked_attributes
 
 produces_value = marker_factory('value_system__produces')
 produces_value.__doc__ = """Mark a function as the producer of the named value."""
@@ -181,10 +181,12 @@ class ValuesManager:
 
     def setup_components(self, components):
         for component in components:
+            marked_members = [member for _, member in marked_attributes(component)]
+
             values_produced = [(v, component) for v in produces_value.finder(component)]
-            values_produced += [(v, getattr(component, att))
-                                for att in sorted(dir(component))
-                                for v in produces_value.finder(getattr(component, att))]
+            values_produced += [(v, member)
+                                for member in marked_members
+                                for v in produces_value.finder(member)]
 
             for name, producer in values_produced:
                 self._pipelines[name].source = producer
@@ -192,9 +194,9 @@ class ValuesManager:
             values_modified = [(v, component, i)
                                for priority in modifies_value.finder(component)
                                for i, v in enumerate(priority)]
-            values_modified += [(v, getattr(component, att), i)
-                                for att in sorted(dir(component))
-                                for i, vs in enumerate(modifies_value.finder(getattr(component, att)))
+            values_modified += [(v, member, i)
+                                for member in marked_members
+                                for i, vs in enumerate(modifies_value.finder(member))
                                 for v in vs]
 
             for name, mutator, priority in values_modified:
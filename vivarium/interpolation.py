@@ -1,9 +1,11 @@
 import pandas as pd
 
-from scipy import interpolate
 
 class Interpolation:
     def __init__(self, data, categorical_parameters, continuous_parameters, func=None, order=1):
+        # scipy is slow to import and only needed once a table is actually built.
+        from scipy import interpolate
+
         self._data = data
         self.key_columns = categorical_parameters
         self.parameter_columns = continuous_parameters
@@ -0,0 +1,276 @@
+"""A synthetic model for measuring the performance of the simulation engine.
+
+The model exercises the same machinery as a real one: mortality from an interpolated life table
+with excess mortality added by diseases through a rate pipeline, a number of diseases each
+modelled as a state machine, a fertility component which grows the population during the run
+and metrics.  All of its data is generated, so it needs no input data and can be run anywhere::
+
+    components:
+        - vivarium.reference_model.ReferenceModel(5)
+
+Causes alternate between SIS diseases, which simulants can catch again as soon as they
+recover, and seasonal SIR diseases, whose infection transition is triggered and only active
+during the first quarter of each year.
+
+Use `measure_throughput` to time the model.
+"""
+import sys
+from time import time
+
+import numpy as np
+import pandas as pd
+
+from vivarium.framework.engine import configure, _step
+from vivarium.framework.event import listens_for
+from vivarium.framework.population import uses_columns, creates_simulants
+from vivarium.framework.state_machine import Machine, State, Trigger
+from vivarium.framework.util import rate_to_probability
+from vivarium.framework.values import produces_value, modifies_value
+from vivarium.test_util import build_table, generate_test_population, age_simulants, setup_simulation
+
+
+class Mortality:
+    """Kills simulants at the rate given by the ``mortality_rate`` pipeline, whose source is a Gompertz life table."""
+
+    def setup(self, builder):
+        self.life_table = builder.lookup(build_table(
+            lambda age, sex, year: 0.0002*np.exp(0.08*age)*np.where(sex == 'Male', 1.2, 1.0)*0.99**(year - 1990.)))
+        self.mortality_rate = builder.rate('mortality_rate')
+        self.randomness = builder.randomness('mortality')
+
+    @produces_value('mortality_rate')
+    def base_mortality_rate(self, index):
+        return pd.Series(self.life_table(index), index=index)
+
+    @listens_for('time_step')
+    @uses_columns(['alive', 'exit_time'], "alive == 'alive'")
+    def die(self, event):
+        dead = self.randomness.filter_for_rate(event.index, self.mortality_rate(event.index))
+        if not dead.empty:
+            event.population_view.update(pd.DataFrame({
+                'alive': pd.Categorical(['dead']*len(dead), categories=event.population.alive.cat.categories),
+                'exit_time': event.time,
+            }, index=dead))
+
+
+class Fertility:
+    """Women aged 15 to 50 give birth at the rate given by the ``fertility_rate`` pipeline."""
+
+    def __init__(self, rate=0.1):
+        self.rate = rate
+
+    def setup(self, builder):
+        self.fertility_rate = builder.rate('fertility_rate')
+        self.randomness = builder.randomness('fertility')
+        self.births = 0
+
+    def get_state(self):
+        return self.births
+
+    def set_state(self, state):
+        self.births = state
+
+    @produces_value('fertility_rate')
+    def base_fertility_rate(self, index):
+        return pd.Series(self.rate, index=index)
+
+    @listens_for('time_step')
+    @uses_columns(['age', 'sex'], "alive == 'alive' and sex == 'Female' and age >= 15 and age < 50")
+    @creates_simulants
+    def give_birth(self, event, simulant_creator):
+        mothers = self.randomness.filter_for_rate(event.index, self.fertility_rate(event.index))
+        if not mothers.empty:
+            simulant_creator(len(mothers), population_configuration={'initial_age': 0})
+            self.births += len(mothers)
+
+
+class Disease:
+    """A disease with age dependent incidence, constant recovery and excess mortality while infected.
+
+    Parameters
+    ----------
+    name : str
+        The disease's population column and the prefix of its rate pipelines.
+    incidence : float
+        Annual incidence at age 50.
+    recovery : float
+        Annual rate at which the infected recover.
+    excess_mortality : float
+        Annual rate of additional mortality while infected.
+    immunity : bool
+        If True the disease is SIR, with immunity that wanes at ``recovery / 10`` and an infection
+        transition that is only active during the first quarter of the year.  Otherwise it is SIS.
+    """
+
+    def __init__(self, name, incidence=0.1, recovery=1.0, excess_mortality=0.05, immunity=False):
+        self.name = name
+        self.incidence = incidence
+        self.recovery = recovery
+        self.excess_mortality = excess_mortality
+        self.immunity = immunity
+
+        self.susceptible = State('susceptible', key=name)
+        self.infected = State('infected', key=name)
+        states = [self.susceptible, self.infected]
+        self.infection = self.susceptible.add_transition(
+            self.infected, self._infection_probability,
+            triggered=Trigger.START_INACTIVE if immunity else Trigger.NOT_TRIGGERED)
+        if immunity:
+            recovered = State('recovered', key=name)
+            self.infected.add_transition(recovered, self._recovery_probability)
+            recovered.add_transition(self.susceptible, self._waning_probability)
+            states.append(recovered)
+        else:
+            self.infected.add_transition(self.susceptible, self._recovery_probability)
+        for state in states:
+            state.allow_self_transitions()
+        self.machine = Machine(name, states=states)
+
+    def setup(self, builder):
+        self.incidence_rate = builder.rate('{}.incidence_rate'.format(self.name))
+        self.incidence_rate.source = builder.lookup(build_table(
+            lambda age, sex, year: self.incidence*(0.5 + age/100)))
+        self.recovery_rate = builder.rate('{}.recovery_rate'.format(self.name))
+        self.recovery_rate.source = lambda index: pd.Series(self.recovery, index=index)
+        self.population_view = builder.population_view([self.name])
+        return [self.machine]
+
+    def _infection_probability(self, index):
+        return rate_to_probability(self.incidence_rate(index))
+
+    def _recovery_probability(self, index):
+        return rate_to_probability(self.recovery_rate(index))
+
+    def _waning_probability(self, index):
+        return rate_to_probability(self.recovery_rate(index)/10)
+
+    @listens_for('initialize_simulants')
+    def load_population(self, event):
+        self.population_view.update(pd.Series('susceptible', index=event.index, name=self.name))
+
+    @listens_for('time_step')
+    @uses_columns([], "alive == 'alive'")
+    def transition(self, event):
+        if self.immunity:
+            if event.time.quarter == 1:
+                self.infection.set_active(event.index)
+            else:
+                self.infection.set_inactive(event.index)
+        self.machine.transition(event.index, event.time)
+
+    @modifies_value('mortality_rate')
+    def excess_mortality_rate(self, index, rates):
+        infected = self.population_view.get(index)[self.name] == 'infected'
+        return rates + infected*self.excess_mortality
+
+    def __repr__(self):
+        return 'Disease({}, immunity={})'.format(self.name, self.immunity)
+
+
+class Metrics:
+    """Counts births, deaths and prevalent cases, and records the counts for every time step in the metrics sink."""
+
+    def __init__(self, fertility, diseases):
+        self.fertility = fertility
+        self.diseases = diseases
+
+    def setup(self, builder):
+        self.population_view = builder.population_view(['alive'] + [disease.name for disease in self.diseases])
+        self.sink = builder.metrics_sink()
+
+    def _counts(self, index):
+        population = self.population_view.get(index)
+        living = population.alive == 'alive'
+        counts = {'living': int(living.sum()), 'deaths': int((population.alive == 'dead').sum()),
+                  'births': self.fertility.births}
+        for disease in self.diseases:
+            counts['{}_prevalent_cases'.format(disease.name)] = int(
+                (living & (population[disease.name] == 'infected')).sum())
+        return counts
+
+    @listens_for('collect_metrics')
+    def record(self, event):
+        self.sink.record('reference_model', self._counts(event.index))
+
+    @modifies_value('metrics')
+    def metrics(self, index, metrics):
+        metrics.update(self._counts(index))
+        return metrics
+
+
+class ReferenceModel:
+    """The whole reference model.
+
+    Parameters
+    ----------
+    causes : int
+        Number of diseases to model.
+    fertility_rate : float
+        Annual birth rate for women aged 15 to 50.
+    """
+
+    def __init__(self, causes=3, fertility_rate=0.1):
+        self.causes = int(causes)
+        self.fertility_rate = fertility_rate
+
+    def setup(self, builder):
+        diseases = [Disease('cause_{}'.format(i), incidence=0.05*(1 + i % 3), excess_mortality=0.01*(1 + i % 5),
+                            immunity=bool(i % 2))
+                    for i in range(self.causes)]
+        fertility = Fertility(self.fertility_rate)
+        return [generate_test_population, age_simulants, Mortality(), fertility] + diseases + [
+            Metrics(fertility, diseases)]
+
+    def __repr__(self):
+        return 'ReferenceModel(causes={})'.format(self.causes)
+
+
+def measure_throughput(population_size=10000, causes=3, steps=12):
+    """Time the reference model.
+
+    The simulation is set up from the current configuration, so ``year_start``, ``year_end`` and
+    ``time_step`` must be configured.
+
+    Parameters
+    ----------
+    population_size : int
+        Size of the initial population.
+    causes : int
+        Number of diseases to model.
+    steps : int
+        Number of time steps to run.
+
+    Returns
+    -------
+    dict
+        The time spent setting up and running, the number of simulant steps run, which counts
+        every living simulant once per step, the simulant steps per second and the peak memory
+        used by the process in megabytes.
+    """
+    import resource
+
+    configure()
+    start = time()
+    simulation = setup_simulation([ReferenceModel(causes)], population_size=population_size)
+    setup_time = time() - start
+
+    simulant_steps = 0
+    start = time()
+    for _ in range(steps):
+        simulant_steps += int((simulation.population._population.alive == 'alive').sum())
+        _step(simulation)
+    run_time = time() - start
+
+    peak_memory = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Reported in bytes on macOS and kilobytes elsewhere
+    peak_memory /= 1024**2 if sys.platform == 'darwin' else 1024
+    return {
+        'population_size': population_size,
+        'causes': causes,
+        'steps': steps,
+        'setup_time': setup_time,
+        'run_time': run_time,
+        'simulant_steps': simulant_steps,
+        'simulant_steps_per_second': simulant_steps/run_time,
+        'peak_memory_mb': peak_memory,
+    }
@@ -108,7 +108,24 @@ def assert_rate(simulation, expected_rate, value_func,
         assert abs(total_expected_rate - total_true_rate)/total_expected_rate < 0.1
 
 
-def build_table(value, columns=('age', 'year', 'sex', 'rate')):
+def build_table(value, columns=('age', 'year', 'sex', 'rate'), extra_key_columns=None):
+    """Build a table with a row for every age, year and sex in the simulation, and each combination
+    of any extra key columns, with ages varying slowest.
+
+    Parameters
+    ----------
+    value : number, callable, None or list of those
+        Value for each value column, the columns after the first three in ``columns``.  None fills a
+        column with random numbers.  Callables are called as ``value(age, sex, year, **extra_keys)``,
+        once with arrays of every row's keys if they support it and once per row otherwise.
+    columns : tuple of str
+    extra_key_columns : dict
+        Maps the names of additional key columns to iterables of their values.
+
+    Returns
+    -------
+    pandas.DataFrame
+    """
     value_columns = columns[3:]
     if not isinstance(value, list):
         value = [value]*len(value_columns)
@@ -116,22 +133,43 @@ def build_table(value, columns=('age', 'year', 'sex', 'rate')):
     if len(value) != len(value_columns):
         raise ValueError('Number of values must match number of value columns')
 
-    rows = []
+    extra_key_columns = {name: list(values) for name, values in (extra_key_columns or {}).items()}
     start_year = config.simulation_parameters.year_start
     end_year = config.simulation_parameters.year_end
-    for age in range(0, 140):
-        for year in range(start_year, end_year+1):
-            for sex in ['Male', 'Female']:
-                r_values = []
-                for v in value:
-                    if v is None:
-                        r_values.append(np.random.random())
-                    elif callable(v):
-                        r_values.append(v(age, sex, year))
-                    else:
-                        r_values.append(v)
-                rows.append([age, year, sex] + r_values)
-    return pd.DataFrame(rows, columns=['age', 'year', 'sex'] + list(value_columns))
+    axes = [np.arange(0, 140), np.arange(start_year, end_year+1), np.array(['Male', 'Female'], dtype=object)]
+    for values in extra_key_columns.values():
+        values = np.array(values)
+        axes.append(values.astype(object) if values.dtype.kind in 'US' else values)
+    grid = [axis[positions].ravel() for axis, positions in
+            zip(axes, np.meshgrid(*[np.arange(len(axis)) for axis in axes], indexing='ij'))]
+    age, year, sex = grid[:3]
+    extra_keys = dict(zip(extra_key_columns, grid[3:]))
+    size = len(age)
+
+    table = pd.DataFrame(dict(extra_keys, age=age, year=year, sex=sex))
+
+    # Drawn as a block, one row at a time, to give the same numbers as drawing a value per cell.
+    random_values = iter(np.random.random((size, value.count(None))).T)
+    for column, v in zip(value_columns, value):
+        if v is None:
+            table[column] = next(random_values)
+        elif callable(v):
+            table[column] = _call_vectorized(v, size, age, sex, year, extra_keys)
+        else:
+            table[column] = v
+    return table[['age', 'year', 'sex'] + list(extra_key_columns) + list(value_columns)]
+
+
+def _call_vectorized(func, size, age, sex, year, extra_keys):
+    try:
+        result = func(age, sex, year, **extra_keys)
+        if np.ndim(result) == 0 or np.shape(result) == (size,):
+            return np.broadcast_to(result, (size,))
+    except Exception:
+        # Only works on scalars
+        pass
+    return [func(*row[:3], **dict(zip(extra_keys, row[3:])))
+            for row in zip(age.tolist(), sex, year.tolist(), *extra_keys.values())]
 
 
 @listens_for('initialize_simulants', priority=0)